@@ -0,0 +1,35 @@
+"""
+Kernel numba para agregação em lote dos scores de interesse
+Usado por RecommendationEngine.build_user_profiles_batch
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def aggregate_interest_scores(indptr, categories, weights, num_categories):
+        """
+        Soma os pesos por (usuário, categoria)
+        
+        As contribuições do usuário i ficam em indptr[i]:indptr[i + 1]; cada
+        iteração paralela escreve apenas na linha do seu usuário, então não há
+        necessidade de operações atômicas.
+        
+        Returns:
+            Tupla (scores, hits) com shape (num_users, num_categories)
+        """
+        num_users = len(indptr) - 1
+        scores = np.zeros((num_users, num_categories), dtype=np.float64)
+        hits = np.zeros((num_users, num_categories), dtype=np.int32)
+        for user in prange(num_users):
+            for i in range(indptr[user], indptr[user + 1]):
+                scores[user, categories[i]] += weights[i]
+                hits[user, categories[i]] += 1
+        return scores, hits
@@ -157,6 +157,10 @@ class AnalyticsEngine:
             grouped = df.groupby(group_columns)
             
             segments = {}
+            # Colunas paralelas (nome, registros, percentual) por segmento
+            segment_names = []
+            segment_records = []
+            segment_percentages = []
             for group_key, group_data in grouped:
                 # Converte chave do grupo para string se necessário
                 if isinstance(group_key, tuple):
@@ -167,29 +171,38 @@ class AnalyticsEngine:
                 # Calcula métricas para o segmento
                 segment_metrics = self._calculate_period_metrics(group_data, value_col, metrics)
                 
+                records = len(group_data)
+                percentage = round((records / len(df)) * 100, 2)
                 segments[segment_name] = {
-                    'records': len(group_data),
+                    'records': records,
                     'metrics': segment_metrics,
-                    'percentage_of_total': round((len(group_data) / len(df)) * 100, 2)
+                    'percentage_of_total': percentage
                 }
+                segment_names.append(segment_name)
+                segment_records.append(records)
+                segment_percentages.append(percentage)
             
-            # Calcula estatísticas gerais
+            # Calcula estatísticas gerais sobre o vetor contíguo de registros
             total_segments = len(segments)
-            largest_segment = max(segments.items(), key=lambda x: x[1]['records'])
-            smallest_segment = min(segments.items(), key=lambda x: x[1]['records'])
+            records_array = np.asarray(segment_records, dtype=np.int64)
+            largest_idx = int(records_array.argmax())
+            smallest_idx = int(records_array.argmin())
             
             result = {
                 'segments': segments,
+                'names': segment_names,
+                'records': segment_records,
+                'percentage_of_total': segment_percentages,
                 'summary': {
                     'total_segments': total_segments,
                     'total_records': len(df),
                     'largest_segment': {
-                        'name': largest_segment[0],
-                        'records': largest_segment[1]['records']
+                        'name': segment_names[largest_idx],
+                        'records': segment_records[largest_idx]
                     },
                     'smallest_segment': {
-                        'name': smallest_segment[0],
-                        'records': smallest_segment[1]['records']
+                        'name': segment_names[smallest_idx],
+                        'records': segment_records[smallest_idx]
                     }
                 },
                 'group_columns': group_columns,
@@ -18,6 +18,7 @@ import os
 from typing import Dict, List, Optional, Union
 from pathlib import Path
 import json
+import codecs
 from datetime import datetime
 
 # Imports opcionais - não quebram se não estiverem disponíveis
@@ -51,6 +52,37 @@ except ImportError:
     MSAL_AVAILABLE = False
     print("⚠️ msal não disponível - autenticação Power BI desabilitada")
 
+try:
+    import pyarrow
+    from pyarrow import csv as pa_csv
+    import pyarrow.compute as pa_compute
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import python_calamine
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Tamanho do bloco de leitura do CSV via Arrow (cada bloco é parseado em uma thread)
+CSV_BLOCK_SIZE = 8 << 20  # 8 MB - EDITE AQUI
+
+# Marcadores de ausência padrão do pd.read_csv (mantém o mesmo resultado no leitor Arrow)
+CSV_NULL_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+# Booleanos reconhecidos pelo parser C do pandas (o Arrow também aceita "1"/"0")
+CSV_TRUE_VALUES = ['True', 'TRUE', 'true']
+CSV_FALSE_VALUES = ['False', 'FALSE', 'false']
+
+# Texto que o parser C converteria em número (separador de milhar, espaços
+# nas bordas) mas o Arrow não: nesses arquivos a leitura volta ao pandas
+CSV_NUMERIC_TEXT = r'^\s*[+-]?[0-9][0-9,]*(\.[0-9]*)?([eE][+-]?[0-9]+)?\s*$'
+
 
 class DataLoader:
     """
@@ -117,6 +149,27 @@ class DataLoader:
             'authority': f"https://login.microsoftonline.com/{os.getenv('POWERBI_TENANT_ID', '')}"
         }
     
+    def load_data(self, file_path: str, **kwargs) -> pd.DataFrame:
+        """
+        Carrega um arquivo local escolhendo o leitor pela extensão.
+        
+        Args:
+            file_path (str): Caminho para o arquivo (.csv, .xlsx ou .xls)
+            **kwargs: Parâmetros repassados ao leitor
+            
+        Returns:
+            pd.DataFrame: Dados carregados
+            
+        Exemplo de uso:
+            df = loader.load_data('data/vendas.xlsx')
+        """
+        suffix = Path(file_path).suffix.lower()
+        if suffix == '.csv':
+            return self.load_csv(file_path, **kwargs)
+        if suffix in ('.xlsx', '.xls'):
+            return self.load_excel(file_path, **kwargs)
+        raise ValueError(f"Formato de arquivo não suportado: {suffix}")
+    
     def load_csv(self, file_path: str, **kwargs) -> pd.DataFrame:
         """
         Carrega dados de arquivo CSV.
@@ -145,7 +198,16 @@ class DataLoader:
             # Mescla parâmetros padrão com os fornecidos
             params = {**default_params, **kwargs}
             
-            df = pd.read_csv(file_path, **params)
+            if PYARROW_AVAILABLE and not kwargs:
+                # Chamada padrão: leitor CSV do Arrow direto, com blocos maiores
+                df = self._read_csv_arrow(file_path, params['encoding'], params['sep'], params['decimal'])
+                if df is None:
+                    # Conteúdo que o Arrow leria diferente do pandas ou não leria
+                    df = pd.read_csv(file_path, **params)
+            else:
+                # Parser C: o engine pyarrow do pandas não aceita 'thousands'
+                # e converte datas ISO em datetime64, mudando o resultado
+                df = pd.read_csv(file_path, **params)
             
             # Validação básica
             if df.empty:
@@ -158,6 +220,66 @@ class DataLoader:
             logger.error(f"Erro ao carregar CSV {file_path}: {str(e)}")
             raise
     
+    def _read_csv_arrow(self, file_path: str, encoding: str, sep: str, decimal: str) -> Optional[pd.DataFrame]:
+        """
+        Lê CSV com pyarrow.csv (multi-thread, blocos de CSV_BLOCK_SIZE) e
+        converte para pandas liberando a memória Arrow durante a conversão.
+        
+        Retorna None quando o resultado divergiria do pd.read_csv padrão:
+        texto com cara de número, como "1,234" entre aspas ou " 5", que o
+        parser C converteria (thousands=',') e o Arrow mantém como texto;
+        cabeçalhos duplicados (o pandas renomeia para a, a.1); ou arquivo que
+        o Arrow recusa, como linhas com menos colunas (o pandas completa com NaN).
+        """
+        # 'utf8' evita a transcodificação em Python feita para outros encodings
+        if codecs.lookup(encoding).name == 'utf-8':
+            encoding = 'utf8'
+        
+        def _read(column_types=None):
+            return pa_csv.read_csv(
+                file_path,
+                read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE, encoding=encoding),
+                # Campos entre aspas podem conter quebras de linha, como no pandas
+                parse_options=pa_csv.ParseOptions(delimiter=sep, newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=column_types,
+                    decimal_point=decimal,
+                    null_values=CSV_NULL_VALUES,
+                    strings_can_be_null=True,
+                    true_values=CSV_TRUE_VALUES,
+                    false_values=CSV_FALSE_VALUES
+                )
+            )
+        
+        try:
+            table = _read()
+            
+            # Cabeçalhos repetidos: o pandas renomeia (a, a.1), o Arrow não
+            if len(set(table.column_names)) != table.num_columns:
+                return None
+            
+            # O pandas não infere datas/horas: relê essas colunas como texto,
+            # preservando a grafia original (o cast de volta mudaria o formato)
+            temporal = {
+                field.name: pyarrow.string() for field in table.schema
+                if pyarrow.types.is_temporal(field.type)
+            }
+            if temporal:
+                table = _read(temporal)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError) as e:
+            logger.debug(f"Leitor CSV do Arrow recusou {file_path}, usando o pandas: {str(e)}")
+            return None
+        
+        for i, field in enumerate(table.schema):
+            # Colunas totalmente vazias viram float64 (NaN), como no pd.read_csv
+            if pyarrow.types.is_null(field.type):
+                table = table.set_column(i, field.name, pyarrow.nulls(table.num_rows, pyarrow.float64()))
+            elif pyarrow.types.is_string(field.type) and field.name not in temporal:
+                if pa_compute.any(pa_compute.match_substring_regex(table.column(i), CSV_NUMERIC_TEXT)).as_py():
+                    return None
+        
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    
     def load_excel(self, file_path: str, sheet_name: Union[str, int] = 0, **kwargs) -> pd.DataFrame:
         """
         Carrega dados de arquivo Excel.
@@ -176,6 +298,10 @@ class DataLoader:
         try:
             logger.info(f"Carregando Excel: {file_path}, planilha: {sheet_name}")
             
+            # calamine (Rust) é bem mais rápido que openpyxl para xlsx/xls
+            if CALAMINE_AVAILABLE and 'engine' not in kwargs:
+                kwargs['engine'] = 'calamine'
+            
             df = pd.read_excel(file_path, sheet_name=sheet_name, **kwargs)
             
             # Validação básica
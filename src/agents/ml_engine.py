@@ -11,6 +11,7 @@ import pickle
 import os
 from pathlib import Path
 import warnings
+import threading
 warnings.filterwarnings('ignore')
 
 # Imports opcionais - não quebram se não estiverem disponíveis
@@ -44,6 +45,12 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+try:
+    from cachetools import LRUCache
+    CACHETOOLS_AVAILABLE = True
+except ImportError:
+    CACHETOOLS_AVAILABLE = False
+
 try:
     from .feedback_system import feedback_system
     FEEDBACK_SYSTEM_AVAILABLE = True
@@ -55,6 +62,13 @@ except ImportError:
 class MLEngine:
     """Engine de Machine Learning para aprendizado contínuo"""
     
+    # Modelos cujas predições são memoizadas pelo vetor de features
+    CACHED_PREDICTION_MODELS = ("quality_classifier", "anomaly_detector")
+    PREDICTION_CACHE_SIZE = 10_000
+    # Casas decimais do execution_time (1ª feature dos dois modelos) na chave do cache - EDITE AQUI
+    # Sem arredondar, o tempo medido com perf_counter nunca se repete e o cache não acerta
+    PREDICTION_TIME_DECIMALS = 2
+    
     def __init__(self, models_dir: str = "data/models"):
         """
         Inicializa o ML Engine
@@ -90,11 +104,46 @@ class MLEngine:
         # Métricas de performance dos modelos
         self.model_metrics = {}
         
+        # Cache de predições: modelo -> {features: resultado}
+        self._prediction_cache = {
+            model_name: LRUCache(maxsize=self.PREDICTION_CACHE_SIZE)
+            for model_name in self.CACHED_PREDICTION_MODELS
+        } if CACHETOOLS_AVAILABLE else {}
+        self._prediction_lock = threading.Lock()
+        
         # Carregar modelos existentes
         self._load_existing_models()
         
         logger.info("MLEngine inicializado com sucesso")
     
+    def _cached_prediction(self, model_name: str, features: List[float], predict) -> Dict[str, Any]:
+        """
+        Reaproveita a predição de um modelo para o mesmo vetor de features.
+        O execution_time (features[0]) é arredondado e a predição usa o vetor
+        arredondado, de modo que o resultado depende só da chave.
+        Exceções de predict não são armazenadas.
+        """
+        cache = self._prediction_cache.get(model_name)
+        if cache is None:
+            return predict(features)
+        
+        features = [round(features[0], self.PREDICTION_TIME_DECIMALS), *features[1:]]
+        key = tuple(features)
+        with self._prediction_lock:
+            result = cache.get(key)
+        if result is None:
+            result = predict(features)
+            with self._prediction_lock:
+                cache[key] = result
+        return result
+    
+    def clear_prediction_cache(self, model_name: Optional[str] = None):
+        """Descarta predições memoizadas (de um modelo ou de todos)"""
+        with self._prediction_lock:
+            for name, cache in self._prediction_cache.items():
+                if model_name is None or name == model_name:
+                    cache.clear()
+    
     def _load_existing_models(self):
         """Carrega modelos previamente treinados"""
         for model_name in self.models.keys():
@@ -391,6 +440,7 @@ class MLEngine:
         # Salvar modelo
         self.models["quality_classifier"] = model
         self._save_model("quality_classifier", model)
+        self.clear_prediction_cache("quality_classifier")
         
         # Salvar métricas
         metrics = {
@@ -508,39 +558,46 @@ class MLEngine:
             # Extrair features
             features = self._extract_quality_features(interaction_data)
             
-            if "quality_classifier" in self.scalers:
-                features = self.scalers["quality_classifier"].transform([features])
-            else:
-                features = np.array([features])
-            
-            # Fazer predição
-            prediction = self.models["quality_classifier"].predict(features)[0]
-            probabilities = self.models["quality_classifier"].predict_proba(features)[0]
-            
-            # Decodificar predição
-            if "quality_classifier" in self.encoders:
-                predicted_quality = self.encoders["quality_classifier"].inverse_transform([prediction])[0]
-                classes = self.encoders["quality_classifier"].classes_
-            else:
-                predicted_quality = str(prediction)
-                classes = [predicted_quality]
-            
-            result = {
-                "predicted_quality": predicted_quality,
-                "confidence": float(max(probabilities)),
-                "probabilities": {
-                    classes[i]: float(prob) for i, prob in enumerate(probabilities)
-                }
-            }
-            
-            return result
+            return self._cached_prediction("quality_classifier", features, self._predict_quality_features)
             
         except Exception as e:
             logger.error(f"Erro na predição de qualidade: {e}")
             return {"error": str(e)}
     
-    def _extract_quality_features(self, interaction_data: Dict) -> List[float]:
-        """Extrai features para predição de qualidade"""
+    def _predict_quality_features(self, features: List[float]) -> Dict[str, Any]:
+        """Executa o classificador de qualidade sobre um vetor de features"""
+        if "quality_classifier" in self.scalers:
+            features = self.scalers["quality_classifier"].transform([features])
+        else:
+            features = np.array([features])
+        
+        # Fazer predição
+        prediction = self.models["quality_classifier"].predict(features)[0]
+        probabilities = self.models["quality_classifier"].predict_proba(features)[0]
+        
+        # Decodificar predição
+        if "quality_classifier" in self.encoders:
+            predicted_quality = self.encoders["quality_classifier"].inverse_transform([prediction])[0]
+            classes = self.encoders["quality_classifier"].classes_
+        else:
+            predicted_quality = str(prediction)
+            classes = [predicted_quality]
+        
+        return {
+            "predicted_quality": predicted_quality,
+            "confidence": float(max(probabilities)),
+            "probabilities": {
+                classes[i]: float(prob) for i, prob in enumerate(probabilities)
+            }
+        }
+    
+    def _extract_quality_features(self, interaction_data: Dict,
+                                  response_data: Optional[Dict] = None,
+                                  response_size: Optional[int] = None) -> List[float]:
+        """
+        Extrai features para predição de qualidade.
+        response_data/response_size já calculados podem ser reaproveitados.
+        """
         features = []
         
         # Features básicas
@@ -548,20 +605,17 @@ class MLEngine:
         success = 1 if interaction_data.get("success") else 0
         
         # Features do resultado
-        response_data = interaction_data.get("response_data", {})
-        if isinstance(response_data, str):
-            try:
-                response_data = json.loads(response_data)
-            except:
-                response_data = {}
+        if response_data is None:
+            response_data = self._parse_payload(interaction_data.get("response_data", {}))
+        if response_size is None:
+            response_size = len(str(response_data))
         
-        result_size = len(str(response_data))
         has_validation = 1 if "validation" in response_data else 0
         
         features = [
             execution_time,
             success,
-            result_size,
+            response_size,
             has_validation,
             0,  # useful (não conhecido ainda)
             0   # has_comment (não conhecido ainda)
@@ -569,6 +623,16 @@ class MLEngine:
         
         return features
     
+    @staticmethod
+    def _parse_payload(payload: Any) -> Any:
+        """Desserializa request/response gravados como JSON ({} se inválido)"""
+        if isinstance(payload, str):
+            try:
+                return json.loads(payload)
+            except:
+                return {}
+        return payload
+    
     def train_anomaly_detector(self, retrain: bool = False) -> Dict[str, Any]:
         """
         Treina detector de anomalias para identificar padrões incomuns
@@ -606,6 +670,7 @@ class MLEngine:
         # Salvar modelo
         self.models["anomaly_detector"] = model
         self._save_model("anomaly_detector", model)
+        self.clear_prediction_cache("anomaly_detector")
         
         # Salvar métricas
         metrics = {
@@ -699,54 +764,50 @@ class MLEngine:
             # Extrair features
             features = self._extract_anomaly_features(interaction_data)
             
-            if "anomaly_detector" in self.scalers:
-                features = self.scalers["anomaly_detector"].transform([features])
-            else:
-                features = np.array([features])
-            
-            # Detectar anomalia
-            prediction = self.models["anomaly_detector"].predict(features)[0]
-            anomaly_score = self.models["anomaly_detector"].decision_function(features)[0]
-            
-            is_anomaly = prediction == -1
-            
-            result = {
-                "is_anomaly": bool(is_anomaly),
-                "anomaly_score": float(anomaly_score),
-                "confidence": abs(float(anomaly_score))
-            }
-            
-            return result
+            return self._cached_prediction("anomaly_detector", features, self._detect_anomaly_features)
             
         except Exception as e:
             logger.error(f"Erro na detecção de anomalia: {e}")
             return {"error": str(e)}
     
-    def _extract_anomaly_features(self, interaction_data: Dict) -> List[float]:
-        """Extrai features para detecção de anomalias"""
+    def _detect_anomaly_features(self, features: List[float]) -> Dict[str, Any]:
+        """Executa o detector de anomalias sobre um vetor de features"""
+        if "anomaly_detector" in self.scalers:
+            features = self.scalers["anomaly_detector"].transform([features])
+        else:
+            features = np.array([features])
+        
+        # Detectar anomalia
+        prediction = self.models["anomaly_detector"].predict(features)[0]
+        anomaly_score = self.models["anomaly_detector"].decision_function(features)[0]
+        
+        is_anomaly = prediction == -1
+        
+        return {
+            "is_anomaly": bool(is_anomaly),
+            "anomaly_score": float(anomaly_score),
+            "confidence": abs(float(anomaly_score))
+        }
+    
+    def _extract_anomaly_features(self, interaction_data: Dict,
+                                  response_size: Optional[int] = None) -> List[float]:
+        """
+        Extrai features para detecção de anomalias.
+        response_size já calculado pode ser reaproveitado.
+        """
         # Features temporais
         execution_time = interaction_data.get("execution_time", 0)
         
         # Features do request
-        request_data = interaction_data.get("request_data", {})
-        if isinstance(request_data, str):
-            try:
-                request_data = json.loads(request_data)
-            except:
-                request_data = {}
+        request_data = self._parse_payload(interaction_data.get("request_data", {}))
         
         request_size = len(str(request_data))
         num_params = len(request_data.keys()) if isinstance(request_data, dict) else 0
         
         # Features do response
-        response_data = interaction_data.get("response_data", {})
-        if isinstance(response_data, str):
-            try:
-                response_data = json.loads(response_data)
-            except:
-                response_data = {}
-        
-        response_size = len(str(response_data))
+        if response_size is None:
+            response_data = self._parse_payload(interaction_data.get("response_data", {}))
+            response_size = len(str(response_data))
         
         # Features do usuário
         user_id_hash = hash(interaction_data.get("user_id", "")) % 1000
@@ -761,6 +822,48 @@ class MLEngine:
         
         return features
     
+    def predict_and_detect(self, interaction_data: Dict) -> Dict[str, Any]:
+        """
+        Predição de qualidade e detecção de anomalia numa única passada:
+        o response é desserializado e medido uma vez para os dois modelos.
+        
+        Args:
+            interaction_data: Dados da interação
+            
+        Returns:
+            {"quality": predição de qualidade, "anomaly": detecção de anomalia}
+        """
+        quality_trained = self.models["quality_classifier"] is not None
+        anomaly_trained = self.models["anomaly_detector"] is not None
+        if not (quality_trained or anomaly_trained):
+            return {"quality": {"error": "Modelo não treinado"}, "anomaly": {"error": "Modelo não treinado"}}
+        
+        response_data = self._parse_payload(interaction_data.get("response_data", {}))
+        response_size = len(str(response_data))
+        
+        result = {}
+        if not quality_trained:
+            result["quality"] = {"error": "Modelo não treinado"}
+        else:
+            try:
+                features = self._extract_quality_features(interaction_data, response_data, response_size)
+                result["quality"] = self._cached_prediction("quality_classifier", features, self._predict_quality_features)
+            except Exception as e:
+                logger.error(f"Erro na predição de qualidade: {e}")
+                result["quality"] = {"error": str(e)}
+        
+        if not anomaly_trained:
+            result["anomaly"] = {"error": "Modelo não treinado"}
+        else:
+            try:
+                features = self._extract_anomaly_features(interaction_data, response_size)
+                result["anomaly"] = self._cached_prediction("anomaly_detector", features, self._detect_anomaly_features)
+            except Exception as e:
+                logger.error(f"Erro na detecção de anomalia: {e}")
+                result["anomaly"] = {"error": str(e)}
+        
+        return result
+    
     def train_user_clusterer(self, retrain: bool = False) -> Dict[str, Any]:
         """
         Treina modelo para agrupar usuários similares
@@ -23,12 +23,101 @@ from pptx.enum.chart import XL_CHART_TYPE
 import pandas as pd
 import re
 import os
-from typing import Dict, List, Optional, Union, Any, Tuple
+from typing import Dict, List, Optional, Union, Any, Tuple, BinaryIO, Callable
 from pathlib import Path
 from loguru import logger
 import json
 from datetime import datetime
 import shutil
+from io import BytesIO
+from functools import lru_cache
+
+# Quantidade de templates distintos com índice de placeholders em cache - EDITE AQUI
+TEMPLATE_INDEX_CACHE_SIZE = 16
+
+
+def _shape_counts(presentation) -> Tuple[int, ...]:
+    """Número de formas de cada slide: assinatura barata da estrutura da apresentação."""
+    return tuple(len(slide.shapes) for slide in presentation.slides)
+
+
+def _build_placeholder_index(presentation, pattern) -> Tuple[Tuple, frozenset, Tuple[int, ...]]:
+    """
+    Percorre a apresentação uma única vez e registra onde há placeholders.
+    
+    Returns:
+        Tuple: (entradas, nomes, formas por slide). Cada entrada é
+        ('frame', slide_idx, shape_idx) para caixas de texto ou
+        ('cell', slide_idx, shape_idx, row_idx, col_idx) para células de
+        tabela; nomes é o conjunto de placeholders encontrados.
+    """
+    entries = []
+    names = set()
+    
+    for slide_idx, slide in enumerate(presentation.slides):
+        for shape_idx, shape in enumerate(slide.shapes):
+            if hasattr(shape, "text_frame"):
+                found = pattern.findall(shape.text_frame.text)
+                if found:
+                    entries.append(('frame', slide_idx, shape_idx))
+                    names.update(found)
+            
+            if shape.has_table:
+                for row_idx, row in enumerate(shape.table.rows):
+                    for col_idx, cell in enumerate(row.cells):
+                        found = pattern.findall(cell.text)
+                        if found:
+                            entries.append(('cell', slide_idx, shape_idx, row_idx, col_idx))
+                            names.update(found)
+    
+    return tuple(entries), frozenset(names), _shape_counts(presentation)
+
+
+@lru_cache(maxsize=TEMPLATE_INDEX_CACHE_SIZE)
+def _template_placeholder_index(template_bytes: bytes, pattern) -> Tuple[Tuple, frozenset, Tuple[int, ...]]:
+    """
+    Índice de placeholders de um template, calculado uma vez por conteúdo.
+    O hash de bytes fica guardado no próprio objeto, então reaproveitar o
+    mesmo buffer entre requisições torna a consulta O(1).
+    """
+    return _build_placeholder_index(Presentation(BytesIO(template_bytes)), pattern)
+
+
+@lru_cache(maxsize=TEMPLATE_INDEX_CACHE_SIZE)
+def _compile_renderer(entries: Tuple) -> Callable:
+    """
+    Gera e compila, uma vez por estrutura de template, uma função em linha
+    reta que acessa diretamente cada forma/célula com placeholder, ex.:
+    
+        def _render(slides, gen, data):
+            shapes_0 = slides[0].shapes
+            replaced = 0
+            replaced += gen._replace_in_text_frame(shapes_0[1].text_frame, data)
+            ...
+            return replaced
+    
+    Os índices vêm de _build_placeholder_index (apenas inteiros), então o
+    código gerado não contém nenhum texto vindo do template.
+    """
+    lines = ["def _render(slides, gen, data):"]
+    for slide_idx in sorted({entry[1] for entry in entries}):
+        lines.append(f"    shapes_{slide_idx} = slides[{slide_idx:d}].shapes")
+    lines.append("    replaced = 0")
+    
+    for entry in entries:
+        shape = f"shapes_{entry[1]}[{entry[2]:d}]"
+        if entry[0] == 'frame':
+            lines.append(f"    replaced += gen._replace_in_text_frame({shape}.text_frame, data)")
+        else:
+            lines.append(
+                f"    replaced += gen._replace_in_paragraphs("
+                f"{shape}.table.cell({entry[3]:d}, {entry[4]:d}).text_frame.paragraphs, data)"
+            )
+    lines.append("    return replaced")
+    
+    namespace = {}
+    exec(compile("\n".join(lines), "<pptx-render>", "exec"), namespace)
+    return namespace["_render"]
 
 
 class PPTXGenerator:
@@ -85,6 +174,9 @@ class PPTXGenerator:
         self.presentation = None
         self.template_path = None
         self.placeholder_pattern = re.compile(self.settings['placeholder_pattern'])
+        # Índice memoizado do template carregado por load_template_bytes;
+        # None nos demais casos (o índice é refeito a cada uso)
+        self._placeholder_index = None
         
         logger.info("PPTXGenerator inicializado com sucesso")
     
@@ -109,6 +201,41 @@ class PPTXGenerator:
             
             self.presentation = Presentation(template_path)
             self.template_path = template_path
+            self._placeholder_index = None
+            
+            # Conta placeholders no template
+            placeholder_count = self._count_placeholders()
+            
+            logger.info(f"Template carregado com sucesso: {len(self.presentation.slides)} slides, {placeholder_count} placeholders")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erro ao carregar template: {str(e)}")
+            return False
+    
+    def load_template_bytes(self, template_bytes: bytes, template_path: Optional[str] = None) -> bool:
+        """
+        Carrega um template PPTX a partir do conteúdo já lido em memória.
+        
+        Permite reaproveitar os bytes do arquivo entre requisições sem
+        reler o template do disco.
+        
+        Args:
+            template_bytes (bytes): Conteúdo do arquivo PPTX
+            template_path (str, optional): Caminho de origem, apenas para referência
+            
+        Returns:
+            bool: True se o template foi carregado com sucesso
+            
+        Exemplo de uso:
+            generator.load_template_bytes(conteudo, 'templates/relatorio.pptx')
+        """
+        try:
+            logger.info(f"Carregando template PPTX da memória: {template_path or '<bytes>'}")
+            
+            self.presentation = Presentation(BytesIO(template_bytes))
+            self.template_path = template_path
+            self._placeholder_index = _template_placeholder_index(template_bytes, self.placeholder_pattern)
             
             # Conta placeholders no template
             placeholder_count = self._count_placeholders()
@@ -135,6 +262,7 @@ class PPTXGenerator:
             
             self.presentation = Presentation()
             self.template_path = None
+            self._placeholder_index = None
             
             logger.info("Nova apresentação criada com sucesso")
             return True
@@ -163,21 +291,11 @@ class PPTXGenerator:
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
-            replaced_count = 0
-            
-            # Percorre todos os slides
-            for slide in self.presentation.slides:
-                # Percorre todas as formas no slide
-                for shape in slide.shapes:
-                    # Verifica se a forma tem texto
-                    if hasattr(shape, "text_frame"):
-                        # Substitui placeholders no texto
-                        replaced_count += self._replace_in_text_frame(shape.text_frame, data)
-                    
-                    # Verifica se é uma tabela
-                    if shape.has_table:
-                        # Substitui placeholders na tabela
-                        replaced_count += self._replace_in_table(shape.table, data)
+            # Renderizador compilado para a estrutura do template: visita
+            # diretamente apenas as formas/células que contêm placeholders
+            entries, _, _ = self._get_placeholder_index()
+            render = _compile_renderer(entries)
+            replaced_count = render(self.presentation.slides, self, data)
             
             logger.info(f"Substituição concluída: {replaced_count} placeholders substituídos")
             return replaced_count
@@ -205,6 +323,9 @@ class PPTXGenerator:
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
+            # A estrutura muda: o índice de placeholders será refeito
+            self._placeholder_index = None
+            
             # Se não especificou layout, usa o primeiro disponível
             if layout_name is None:
                 slide_layout = self.presentation.slide_layouts[0]
@@ -263,6 +384,9 @@ class PPTXGenerator:
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
+            # A estrutura muda: o índice de placeholders será refeito
+            self._placeholder_index = None
+            
             if slide_idx < 0 or slide_idx >= len(self.presentation.slides):
                 raise ValueError(f"Índice de slide inválido: {slide_idx}")
             
@@ -347,6 +471,9 @@ class PPTXGenerator:
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
+            # A estrutura muda: o índice de placeholders será refeito
+            self._placeholder_index = None
+            
             if slide_idx < 0 or slide_idx >= len(self.presentation.slides):
                 raise ValueError(f"Índice de slide inválido: {slide_idx}")
             
@@ -417,6 +544,9 @@ class PPTXGenerator:
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
+            # A estrutura muda: o índice de placeholders será refeito
+            self._placeholder_index = None
+            
             if slide_idx < 0 or slide_idx >= len(self.presentation.slides):
                 raise ValueError(f"Índice de slide inválido: {slide_idx}")
             
@@ -452,32 +582,36 @@ class PPTXGenerator:
             logger.error(f"Erro ao adicionar imagem: {str(e)}")
             return False
     
-    def save_presentation(self, output_path: str) -> bool:
+    def save_presentation(self, output_path: Union[str, BinaryIO]) -> bool:
         """
-        Salva a apresentação em um arquivo.
+        Salva a apresentação em um arquivo ou em um objeto file-like.
         
         Args:
-            output_path (str): Caminho para salvar o arquivo PPTX
+            output_path (str | BinaryIO): Caminho do arquivo PPTX ou buffer
+                binário (ex.: BytesIO) para gerar a apresentação em memória
             
         Returns:
             bool: True se a apresentação foi salva com sucesso
             
         Exemplo de uso:
             generator.save_presentation('output/relatorio_final.pptx')
+            generator.save_presentation(buffer)  # buffer = BytesIO()
         """
         try:
-            logger.info(f"Salvando apresentação: {output_path}")
+            is_path = isinstance(output_path, (str, os.PathLike))
+            logger.info(f"Salvando apresentação: {output_path if is_path else '<stream>'}")
             
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
             # Cria diretório se não existir
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            if is_path:
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
             
             # Salva apresentação
             self.presentation.save(output_path)
             
-            logger.info(f"Apresentação salva com sucesso: {output_path}")
+            logger.info(f"Apresentação salva com sucesso: {output_path if is_path else '<stream>'}")
             return True
             
         except Exception as e:
@@ -519,25 +653,8 @@ class PPTXGenerator:
             if not self.presentation:
                 raise ValueError("Nenhuma apresentação carregada")
             
-            placeholders = set()
-            
-            # Percorre todos os slides
-            for slide in self.presentation.slides:
-                # Percorre todas as formas no slide
-                for shape in slide.shapes:
-                    # Verifica se a forma tem texto
-                    if hasattr(shape, "text_frame"):
-                        # Extrai placeholders do texto
-                        self._extract_placeholders(shape.text_frame.text, placeholders)
-                    
-                    # Verifica se é uma tabela
-                    if shape.has_table:
-                        # Extrai placeholders da tabela
-                        for row in shape.table.rows:
-                            for cell in row.cells:
-                                self._extract_placeholders(cell.text, placeholders)
-            
-            return sorted(list(placeholders))
+            _, placeholders, _ = self._get_placeholder_index()
+            return sorted(placeholders)
             
         except Exception as e:
             logger.error(f"Erro ao obter lista de placeholders: {str(e)}")
@@ -618,69 +735,66 @@ class PPTXGenerator:
         if not self.presentation:
             return 0
         
-        count = 0
-        placeholders = set()
-        
-        # Percorre todos os slides
-        for slide in self.presentation.slides:
-            # Percorre todas as formas no slide
-            for shape in slide.shapes:
-                # Verifica se a forma tem texto
-                if hasattr(shape, "text_frame"):
-                    # Extrai placeholders do texto
-                    self._extract_placeholders(shape.text_frame.text, placeholders)
-                
-                # Verifica se é uma tabela
-                if shape.has_table:
-                    # Extrai placeholders da tabela
-                    for row in shape.table.rows:
-                        for cell in row.cells:
-                            self._extract_placeholders(cell.text, placeholders)
-        
+        _, placeholders, _ = self._get_placeholder_index()
         return len(placeholders)
     
-    def _extract_placeholders(self, text: str, placeholders: set) -> None:
-        """Extrai placeholders de um texto e adiciona ao conjunto."""
-        if not text:
-            return
+    def _get_placeholder_index(self) -> Tuple[Tuple, frozenset, Tuple[int, ...]]:
+        """
+        Índice de placeholders da apresentação atual.
         
-        matches = self.placeholder_pattern.findall(text)
-        for match in matches:
-            placeholders.add(match)
+        O índice memoizado de load_template_bytes só é usado enquanto o número
+        de formas por slide for o do template; se a apresentação foi alterada
+        (ou veio de load_template/create_new_presentation), percorre de novo.
+        """
+        index = self._placeholder_index
+        if index is not None and index[2] == _shape_counts(self.presentation):
+            return index
+        return _build_placeholder_index(self.presentation, self.placeholder_pattern)
     
-    def _replace_in_text_frame(self, text_frame, data: Dict) -> int:
-        """Substitui placeholders em um frame de texto."""
-        replaced_count = 0
+    def _substitute(self, text: str, data: Dict) -> Tuple[str, int]:
+        """
+        Substitui em uma única passada os placeholders presentes em data.
+        Placeholders sem valor são mantidos como estão.
         
-        if not text_frame.text:
-            return replaced_count
+        Returns:
+            Tuple[str, int]: Texto resultante e número de substituições
+        """
+        replaced = 0
         
-        # Substitui no texto principal
-        original_text = text_frame.text
-        new_text = original_text
+        def _value(match):
+            nonlocal replaced
+            key = match.group(1)
+            if key in data:
+                replaced += 1
+                return str(data[key])
+            return match.group(0)
         
-        for match in self.placeholder_pattern.findall(original_text):
-            if match in data:
-                placeholder = f"{{{{{match}}}}}"
-                new_text = new_text.replace(placeholder, str(data[match]))
-                replaced_count += 1
+        return self.placeholder_pattern.sub(_value, text), replaced
+    
+    def _replace_in_text_frame(self, text_frame, data: Dict) -> int:
+        """Substitui placeholders em um frame de texto."""
+        original_text = text_frame.text
+        if not original_text:
+            return 0
         
+        # Substitui no texto principal
+        new_text, replaced_count = self._substitute(original_text, data)
         if new_text != original_text:
             text_frame.text = new_text
         
         # Substitui em cada parágrafo
-        for paragraph in text_frame.paragraphs:
+        return replaced_count + self._replace_in_paragraphs(text_frame.paragraphs, data)
+    
+    def _replace_in_paragraphs(self, paragraphs, data: Dict) -> int:
+        """Substitui placeholders em uma sequência de parágrafos."""
+        replaced_count = 0
+        
+        for paragraph in paragraphs:
             original_text = paragraph.text
-            new_text = original_text
-            
-            for match in self.placeholder_pattern.findall(original_text):
-                if match in data:
-                    placeholder = f"{{{{{match}}}}}"
-                    new_text = new_text.replace(placeholder, str(data[match]))
-                    replaced_count += 1
-            
+            new_text, replaced = self._substitute(original_text, data)
             if new_text != original_text:
                 paragraph.text = new_text
+            replaced_count += replaced
         
         return replaced_count
     
@@ -690,18 +804,7 @@ class PPTXGenerator:
         
         for row in table.rows:
             for cell in row.cells:
-                for paragraph in cell.text_frame.paragraphs:
-                    original_text = paragraph.text
-                    new_text = original_text
-                    
-                    for match in self.placeholder_pattern.findall(original_text):
-                        if match in data:
-                            placeholder = f"{{{{{match}}}}}"
-                            new_text = new_text.replace(placeholder, str(data[match]))
-                            replaced_count += 1
-                    
-                    if new_text != original_text:
-                        paragraph.text = new_text
+                replaced_count += self._replace_in_paragraphs(cell.text_frame.paragraphs, data)
         
         return replaced_count
 
@@ -6,8 +6,14 @@ Analisa padrões de uso e gera sugestões personalizadas
 import pandas as pd
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
-from collections import defaultdict, Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from heapq import nlargest
+from operator import itemgetter
 import json
+import re
+import time
+from types import MappingProxyType
 
 # Imports opcionais - não quebram se não estiverem disponíveis
 try:
@@ -20,7 +26,7 @@ except ImportError:
 try:
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.metrics.pairwise import cosine_similarity
-    from sklearn.cluster import KMeans
+    from sklearn.cluster import KMeans, MiniBatchKMeans
     SKLEARN_AVAILABLE = True
 except ImportError:
     SKLEARN_AVAILABLE = False
@@ -34,6 +40,17 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+try:
+    from ._numba_interest import NUMBA_AVAILABLE, aggregate_interest_scores
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 try:
     from .feedback_system import feedback_system
     FEEDBACK_SYSTEM_AVAILABLE = True
@@ -42,15 +59,204 @@ except ImportError:
     print("⚠️ feedback_system não disponível - usando dados simulados")
 
 
+# Dicionário vazio compartilhado para lookups com default (nunca deve ser modificado)
+_EMPTY_DICT: Dict[str, Any] = {}
+
+# Ordem fixa das categorias de interesse (índices usados nas agregações vetorizadas)
+_INTEREST_CATEGORIES = (
+    "temporal_analysis",
+    "segmentation",
+    "frequency_analysis",
+    "performance_metrics",
+    "financial_analysis",
+    "general_analysis",
+)
+_CATEGORY_INDEX = {category: i for i, category in enumerate(_INTEREST_CATEGORIES)}
+
+# Vocabulários fixos dos atributos categóricos do perfil (codificados como int8 na tabela SoA)
+_PERSONAS = (
+    "explorer_analyst",
+    "focused_specialist",
+    "casual_user",
+    "performance_analyst",
+    "trend_analyst",
+    "balanced_user",
+)
+_PERSONA_INDEX = {persona: i for i, persona in enumerate(_PERSONAS)}
+_ACTIVITY_LEVELS = ("very_low", "low", "medium", "high")
+_ACTIVITY_INDEX = {level: i for i, level in enumerate(_ACTIVITY_LEVELS)}
+_EXPERTISE_LEVELS = ("beginner", "intermediate", "advanced", "expert")
+_EXPERTISE_INDEX = {level: i for i, level in enumerate(_EXPERTISE_LEVELS)}
+
+# Capacidade inicial da tabela de perfis (dobra quando enche)
+_PROFILE_TABLE_INITIAL_CAPACITY = 64
+
+# Scores de interesse ficam quantizados em uint8 (0..255) na tabela de similaridade
+_INTEREST_SCALE = 255
+
+
+def _quantize_interests(scores: np.ndarray) -> np.ndarray:
+    """Quantiza scores de interesse em [0, 1] para uint8"""
+    return np.clip(np.round(scores * _INTEREST_SCALE), 0, _INTEREST_SCALE).astype(np.uint8)
+
+
+# Clustering de personas: usuários mais ativos usados no ajuste e tamanho do lote de atribuição
+_PERSONA_CLUSTER_SAMPLE_USERS = 100_000
+_PERSONA_ASSIGN_BATCH_ROWS = 10_000
+
+
+# Recomendações fixas por persona (somente leitura, compartilhadas entre chamadas)
+_PERSONA_RECS = {
+    "explorer_analyst": (
+        MappingProxyType({"type": "custom_kpis", "reason": "Explore novos KPIs personalizados", "priority": 0.8}),
+        MappingProxyType({"type": "trend_analysis", "reason": "Analise tendências nos seus dados", "priority": 0.7}),
+        MappingProxyType({"type": "correlation_analysis", "reason": "Descubra correlações interessantes", "priority": 0.6})
+    ),
+    "focused_specialist": (
+        MappingProxyType({"type": "deep_dive_analysis", "reason": "Análise aprofundada da sua área", "priority": 0.9}),
+        MappingProxyType({"type": "benchmark_analysis", "reason": "Compare com benchmarks do setor", "priority": 0.7})
+    ),
+    "casual_user": (
+        MappingProxyType({"type": "summary", "reason": "Visão geral dos seus dados", "priority": 0.9}),
+        MappingProxyType({"type": "compare_periods", "reason": "Compare períodos recentes", "priority": 0.8}),
+        MappingProxyType({"type": "top_insights", "reason": "Principais insights automáticos", "priority": 0.7})
+    ),
+    "performance_analyst": (
+        MappingProxyType({"type": "kpi_dashboard", "reason": "Dashboard de KPIs atualizado", "priority": 0.9}),
+        MappingProxyType({"type": "performance_trends", "reason": "Tendências de performance", "priority": 0.8}),
+        MappingProxyType({"type": "goal_tracking", "reason": "Acompanhamento de metas", "priority": 0.7})
+    ),
+    "trend_analyst": (
+        MappingProxyType({"type": "time_series_analysis", "reason": "Análise de séries temporais", "priority": 0.9}),
+        MappingProxyType({"type": "seasonal_patterns", "reason": "Padrões sazonais", "priority": 0.8}),
+        MappingProxyType({"type": "forecast", "reason": "Previsões baseadas em tendências", "priority": 0.7})
+    ),
+    "balanced_user": (
+        MappingProxyType({"type": "compare_periods", "reason": "Comparação de períodos", "priority": 0.8}),
+        MappingProxyType({"type": "segment_groups", "reason": "Segmentação por grupos", "priority": 0.7}),
+        MappingProxyType({"type": "summary", "reason": "Resumo geral", "priority": 0.6})
+    ),
+}
+
+
+@lru_cache(maxsize=16)
+def _persona_recs_cached(persona: str) -> Tuple[MappingProxyType, ...]:
+    """Recomendações da persona (com fallback para balanced_user), memoizadas por persona"""
+    return _PERSONA_RECS.get(persona, _PERSONA_RECS["balanced_user"])
+
+
+# Templates recomendados por persona e por tipo de análise
+_PERSONA_TEMPLATES = {
+    "explorer_analyst": ("template_dashboard.pptx", "template_detailed.pptx"),
+    "focused_specialist": ("template_executive.pptx", "template_focused.pptx"),
+    "casual_user": ("template_simple.pptx", "template_summary.pptx"),
+    "performance_analyst": ("template_kpi.pptx", "template_metrics.pptx"),
+    "trend_analyst": ("template_trends.pptx", "template_temporal.pptx"),
+    "balanced_user": ("template_relatorio.pptx", "template_general.pptx"),
+}
+_ANALYSIS_TEMPLATES = {
+    "compare_periods": ("template_comparison.pptx", "template_temporal.pptx"),
+    "segment_groups": ("template_segmentation.pptx", "template_categories.pptx"),
+    "count_reasons": ("template_frequency.pptx", "template_ranking.pptx"),
+    "custom_kpis": ("template_kpi.pptx", "template_metrics.pptx"),
+}
+
+# Colunas que disparam recomendações baseadas no contexto dos dados
+_TIME_COLUMNS = frozenset({"data", "timestamp"})
+_SEGMENT_COLUMNS = frozenset({"grupo", "categoria", "tipo"})
+_REASON_COLUMNS = frozenset({"motivo", "razao"})
+
+# Ordem numérica das prioridades de alertas (gravada no alerta para ordenação direta)
+_ALERT_PRIORITY_RANK = {"high": 3, "medium": 2, "low": 1}
+
+# Palavras-chave por categoria compiladas em uma única expressão (uma passada por item)
+_CATEGORY_RE = re.compile(
+    r"(?P<temporal_analysis>compare|periodo|temporal)"
+    r"|(?P<segmentation>segment|grupo|categoria)"
+    r"|(?P<frequency_analysis>motivo|razao|count)"
+    r"|(?P<performance_metrics>kpi|metric|performance)"
+    r"|(?P<financial_analysis>vendas|receita|financeiro)",
+    re.IGNORECASE,
+)
+
+
+@dataclass(slots=True)
+class UserProfile:
+    """Perfil de usuário construído pelo RecommendationEngine"""
+    user_id: str
+    persona: str
+    usage_patterns: Dict[str, Any]
+    preferences: Dict[str, Any]
+    interest_scores: np.ndarray  # Vetor denso na ordem de _INTEREST_CATEGORIES (0 = sem interesse)
+    last_updated: str
+    activity_level: str
+    expertise_level: str
+    total_interactions: int
+    
+    def interest_dict(self) -> Dict[str, float]:
+        """Scores de interesse das categorias observadas, indexados pelo nome da categoria"""
+        return {
+            _INTEREST_CATEGORIES[i]: float(self.interest_scores[i])
+            for i in np.flatnonzero(self.interest_scores)
+        }
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Representação em dicionário (formato das respostas da API)"""
+        return {
+            "user_id": self.user_id,
+            "persona": self.persona,
+            "usage_patterns": self.usage_patterns,
+            "preferences": self.preferences,
+            "interest_scores": self.interest_dict(),
+            "last_updated": self.last_updated,
+            "activity_level": self.activity_level,
+            "expertise_level": self.expertise_level
+        }
+
+# Último timestamp ISO gerado e o instante monotônico em que foi gerado
+_iso_cache: Tuple[float, str] = (float("-inf"), "")
+
+
+def _cached_now_iso() -> str:
+    """Timestamp ISO atual com resolução de 1s (evita formatar datetime a cada perfil)"""
+    global _iso_cache
+    stamped_at, iso = _iso_cache
+    now = time.monotonic()
+    if now - stamped_at >= 1.0:
+        iso = datetime.now().isoformat()
+        _iso_cache = (now, iso)
+    return iso
+
+
 class RecommendationEngine:
     """Engine de recomendações baseado em padrões de uso e feedback"""
     
     def __init__(self):
         """Inicializa o sistema de recomendações"""
-        self.user_profiles = {}
+        self.user_profiles: Dict[str, UserProfile] = {}
         self.analysis_similarity_matrix = None
+        
+        # Tabela de perfis em layout SoA (uma linha por usuário) para varreduras de similaridade
+        capacity = _PROFILE_TABLE_INITIAL_CAPACITY
+        self._user_id_to_row: Dict[str, int] = {}
+        self._row_user_ids: List[str] = []
+        self._persona_arr = np.zeros(capacity, dtype=np.int8)
+        self._activity_arr = np.zeros(capacity, dtype=np.int8)
+        self._expertise_arr = np.zeros(capacity, dtype=np.int8)
+        self._interactions_arr = np.zeros(capacity, dtype=np.int64)
+        self._interest_matrix = np.zeros((capacity, len(_INTEREST_CATEGORIES)), dtype=np.uint8)
+        
+        # Frequências usuário x tipo de análise (linhas alinhadas à tabela SoA) para a matriz CSR
+        self._analysis_type_index: Dict[str, int] = {}
+        self._analysis_types: List[str] = []
+        self._usage_rows: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._usage_csr = None
         self.template_similarity_matrix = None
         
+        # Centróides de persona aprendidos por cluster_personas() (None = regras heurísticas)
+        self.persona_centroids = None
+        self._centroid_personas = None
+        
         # Inicializar vectorizer apenas se sklearn estiver disponível
         if SKLEARN_AVAILABLE:
             self.vectorizer = TfidfVectorizer(stop_words=['portuguese'])
@@ -62,73 +268,278 @@ class RecommendationEngine:
         else:
             print("✅ RecommendationEngine inicializado com sucesso")
     
-    def build_user_profile(self, user_id: str) -> Dict[str, Any]:
+    def build_user_profile(self, user_id: str, now_iso: Optional[str] = None) -> Dict[str, Any]:
         """
         Constrói perfil do usuário baseado no histórico
         
         Args:
             user_id: ID do usuário
+            now_iso: Timestamp ISO de atualização (ex.: compartilhado por um lote)
             
         Returns:
             Perfil do usuário com preferências e padrões
         """
+        return self._build_profile(user_id, now_iso).as_dict()
+    
+    def _build_profile(self, user_id: str, now_iso: Optional[str] = None) -> UserProfile:
+        """Constrói e registra o perfil do usuário"""
         # Obter dados do usuário
         patterns = feedback_system.get_user_patterns(user_id)
         preferences = feedback_system.get_user_preferences(user_id)
         
+        # Extrair tipos/frequências uma única vez (reaproveitado pelas etapas abaixo)
+        pattern_arrays = self._pattern_arrays(patterns)
+        
+        # Calcular scores de interesse
+        interest_scores = self._calculate_interest_scores(patterns, preferences, pattern_arrays)
+        
+        return self._assemble_profile(user_id, patterns, preferences, pattern_arrays, interest_scores, now_iso)
+    
+    def build_user_profiles_batch(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Constrói perfis de vários usuários de uma vez (ex.: reconstrução noturna)
+        
+        A agregação dos scores de interesse de todos os usuários roda em um
+        único kernel numba paralelo; sem numba, cai no caminho por usuário.
+        
+        Args:
+            user_ids: IDs dos usuários
+            
+        Returns:
+            Perfis indexados por ID do usuário
+        """
+        # Um único timestamp para todo o lote
+        now_iso = datetime.now().isoformat()
+        
+        if not NUMBA_AVAILABLE:
+            return {user_id: self.build_user_profile(user_id, now_iso) for user_id in user_ids}
+        
+        histories = []
+        categories = []
+        weights = []
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        
+        for i, user_id in enumerate(user_ids):
+            patterns = feedback_system.get_user_patterns(user_id)
+            preferences = feedback_system.get_user_preferences(user_id)
+            pattern_arrays = self._pattern_arrays(patterns)
+            histories.append((patterns, preferences, pattern_arrays))
+            
+            user_categories, user_weights = self._interest_contributions(preferences, pattern_arrays)
+            categories.append(user_categories)
+            weights.append(user_weights)
+            indptr[i + 1] = indptr[i] + len(user_categories)
+        
+        # Contribuições de todos os usuários contíguas (linha do usuário i em indptr[i]:indptr[i+1])
+        all_categories = np.concatenate(categories).astype(np.int32) if categories else np.zeros(0, dtype=np.int32)
+        all_weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float64)
+        scores, hits = aggregate_interest_scores(indptr, all_categories, all_weights, len(_INTEREST_CATEGORIES))
+        
+        profiles = {}
+        for i, user_id in enumerate(user_ids):
+            patterns, preferences, pattern_arrays = histories[i]
+            interest_scores = self._normalize_interest_scores(scores[i], hits[i] > 0)
+            profiles[user_id] = self._assemble_profile(
+                user_id, patterns, preferences, pattern_arrays, interest_scores, now_iso
+            ).as_dict()
+        
+        logger.info(f"Perfis construídos em lote para {len(user_ids)} usuários")
+        return profiles
+    
+    def _assemble_profile(self, user_id: str, patterns: List[Dict], preferences: Dict,
+                          pattern_arrays: Tuple, interest_scores: Dict[str, float],
+                          now_iso: Optional[str] = None) -> UserProfile:
+        """Monta e registra o perfil a partir do histórico e dos scores de interesse já calculados"""
         # Analisar padrões de uso
-        usage_analysis = self._analyze_usage_patterns(patterns)
+        usage_analysis = self._analyze_usage_patterns(patterns, pattern_arrays)
         
         # Analisar preferências
         preference_analysis = self._analyze_preferences(preferences)
         
-        # Calcular scores de interesse
-        interest_scores = self._calculate_interest_scores(patterns, preferences)
-        
-        # Detectar persona do usuário
-        persona = self._detect_user_persona(usage_analysis, preference_analysis)
-        
-        profile = {
-            "user_id": user_id,
-            "persona": persona,
-            "usage_patterns": usage_analysis,
-            "preferences": preference_analysis,
-            "interest_scores": interest_scores,
-            "last_updated": datetime.now().isoformat(),
-            "activity_level": self._calculate_activity_level(patterns),
-            "expertise_level": self._estimate_expertise_level(patterns, preferences)
-        }
+        interest_vector = self._interest_vector(interest_scores)
+        
+        # Detectar persona do usuário (centróide mais próximo quando o clustering já foi executado)
+        if self.persona_centroids is not None:
+            persona = self._nearest_persona(interest_vector[np.newaxis, :])[0]
+        else:
+            persona = self._detect_user_persona(usage_analysis, preference_analysis)
+        
+        profile = UserProfile(
+            user_id=user_id,
+            persona=persona,
+            usage_patterns=usage_analysis,
+            preferences=preference_analysis,
+            interest_scores=interest_vector,
+            last_updated=now_iso or _cached_now_iso(),
+            activity_level=self._calculate_activity_level(patterns),
+            expertise_level=self._estimate_expertise_level(patterns, preferences),
+            total_interactions=usage_analysis.get("total_interactions", 0)
+        )
         
         self.user_profiles[user_id] = profile
+        self._store_profile_row(profile)
         logger.info(f"Perfil construído para usuário {user_id} - Persona: {persona}")
         return profile
     
-    def _analyze_usage_patterns(self, patterns: List[Dict]) -> Dict[str, Any]:
+    def _store_profile_row(self, profile: UserProfile):
+        """Grava (ou atualiza) a linha do usuário na tabela SoA de perfis"""
+        user_id = profile.user_id
+        row = self._user_id_to_row.get(user_id)
+        if row is None:
+            row = len(self._row_user_ids)
+            if row == len(self._persona_arr):
+                self._grow_profile_table()
+            self._user_id_to_row[user_id] = row
+            self._row_user_ids.append(user_id)
+        
+        self._persona_arr[row] = _PERSONA_INDEX[profile.persona]
+        self._activity_arr[row] = _ACTIVITY_INDEX[profile.activity_level]
+        self._expertise_arr[row] = _EXPERTISE_INDEX[profile.expertise_level]
+        self._interactions_arr[row] = profile.total_interactions
+        
+        # Linha esparsa de frequências por tipo de análise; a matriz CSR em cache
+        # só é descartada se a linha mudou (recommend_analyses reconstrói o perfil a cada chamada)
+        usage_frequency = profile.usage_patterns.get("usage_frequency", {})
+        columns = np.array(
+            [self._analysis_type_column(analysis_type) for analysis_type in usage_frequency], dtype=np.int32
+        )
+        values = np.array(list(usage_frequency.values()), dtype=np.float32)
+        if row == len(self._usage_rows):
+            self._usage_rows.append((columns, values))
+            self._usage_csr = None
+        else:
+            old_columns, old_values = self._usage_rows[row]
+            if not (np.array_equal(columns, old_columns) and np.array_equal(values, old_values)):
+                self._usage_rows[row] = (columns, values)
+                self._usage_csr = None
+        self._interest_matrix[row] = _quantize_interests(profile.interest_scores)
+    
+    def _analysis_type_column(self, analysis_type: str) -> int:
+        """Índice da coluna do tipo de análise na matriz usuário x análise"""
+        column = self._analysis_type_index.get(analysis_type)
+        if column is None:
+            column = len(self._analysis_types)
+            self._analysis_type_index[analysis_type] = column
+            self._analysis_types.append(analysis_type)
+        return column
+    
+    def _build_user_analysis_csr(self) -> Tuple[Any, List[str], List[str]]:
+        """
+        Monta a matriz CSR usuário x tipo de análise com linhas normalizadas (L2)
+        
+        Returns:
+            Tupla (matriz, user_ids das linhas, tipos de análise das colunas)
+        """
+        num_users = len(self._row_user_ids)
+        lengths = np.array([len(columns) for columns, _ in self._usage_rows], dtype=np.int64)
+        indptr = np.zeros(num_users + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        
+        if num_users:
+            indices = np.concatenate([columns for columns, _ in self._usage_rows])
+            data = np.concatenate([values for _, values in self._usage_rows])
+        else:
+            indices = np.zeros(0, dtype=np.int32)
+            data = np.zeros(0, dtype=np.float32)
+        
+        # Normalizar cada linha uma única vez: o produto X @ X.T passa a ser a similaridade de cosseno
+        row_of_entry = np.repeat(np.arange(num_users), lengths)
+        norms = np.sqrt(np.bincount(row_of_entry, weights=data.astype(np.float64) ** 2, minlength=num_users))
+        entry_norms = norms[row_of_entry]
+        data = np.divide(data, entry_norms, out=np.zeros_like(data), where=entry_norms > 0)
+        
+        matrix = sparse.csr_matrix(
+            (data, indices, indptr), shape=(num_users, len(self._analysis_types)), dtype=np.float32
+        )
+        return matrix, self._row_user_ids, self._analysis_types
+    
+    def _usage_similarity(self, user_id: str) -> Optional[np.ndarray]:
+        """
+        Similaridade de cosseno entre o uso do usuário e o de todos os demais
+        
+        Returns:
+            Array alinhado às linhas da tabela SoA, ou None se não houver scipy
+            ou histórico de uso para o usuário
+        """
+        if not SCIPY_AVAILABLE:
+            return None
+        
+        row = self._user_id_to_row.get(user_id)
+        if row is None or len(self._usage_rows[row][0]) == 0:
+            return None
+        
+        if self._usage_csr is None:
+            self._usage_csr, _, _ = self._build_user_analysis_csr()
+        
+        matrix = self._usage_csr
+        return np.asarray(matrix.dot(matrix[row].T).todense()).ravel()
+    
+    def _grow_profile_table(self):
+        """Dobra a capacidade dos arrays da tabela SoA"""
+        capacity = len(self._persona_arr) * 2
+        
+        def grow(arr: np.ndarray) -> np.ndarray:
+            new_arr = np.zeros((capacity,) + arr.shape[1:], dtype=arr.dtype)
+            new_arr[:len(arr)] = arr
+            return new_arr
+        
+        self._persona_arr = grow(self._persona_arr)
+        self._activity_arr = grow(self._activity_arr)
+        self._expertise_arr = grow(self._expertise_arr)
+        self._interactions_arr = grow(self._interactions_arr)
+        self._interest_matrix = grow(self._interest_matrix)
+    
+    def _interest_vector(self, interest_scores: Dict[str, float]) -> np.ndarray:
+        """Converte scores de interesse em vetor denso na ordem de _INTEREST_CATEGORIES"""
+        vec = np.zeros(len(_INTEREST_CATEGORIES), dtype=np.float64)
+        for category, score in interest_scores.items():
+            vec[_CATEGORY_INDEX[category]] = score
+        return vec
+    
+    def _pattern_arrays(self, patterns: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Converte padrões em arrays para agregação vetorizada
+        
+        Returns:
+            Tupla (codes, uniques, freqs): código do tipo de análise por padrão,
+            tipos distintos (ordem de aparição) e frequência por padrão
+        """
+        types = []
+        frequencies = []
+        for pattern in patterns:
+            pattern_data = pattern.get("pattern_data") or _EMPTY_DICT
+            types.append(pattern_data.get("analysis_type", "unknown"))
+            frequencies.append(pattern.get("frequency", 1))
+        
+        freqs = np.array(frequencies, dtype=np.int32)
+        codes, uniques = pd.factorize(np.array(types, dtype=object), use_na_sentinel=False)
+        return codes, uniques, freqs
+    
+    def _analyze_usage_patterns(self, patterns: List[Dict],
+                                pattern_arrays: Optional[Tuple] = None) -> Dict[str, Any]:
         """Analisa padrões de uso do usuário"""
         if not patterns:
             return {"most_used_analyses": [], "usage_frequency": {}, "time_patterns": {}}
         
-        # Contar tipos de análise mais usados
-        analysis_counts = Counter()
-        total_frequency = 0
+        codes, uniques, freqs = pattern_arrays if pattern_arrays is not None else self._pattern_arrays(patterns)
         
-        for pattern in patterns:
-            pattern_data = pattern.get("pattern_data", {})
-            analysis_type = pattern_data.get("analysis_type", "unknown")
-            frequency = pattern.get("frequency", 1)
-            
-            analysis_counts[analysis_type] += frequency
-            total_frequency += frequency
+        # Contar tipos de análise mais usados (soma de frequências por tipo)
+        counts = np.bincount(codes, weights=freqs, minlength=len(uniques)).astype(np.int64)
+        total_frequency = int(freqs.sum())
+        
+        # Ordenação estável mantém a ordem de aparição em empates (como Counter.most_common)
+        top = np.argsort(-counts, kind="stable")[:5]
+        most_common = [(uniques[i], int(counts[i])) for i in top]
         
         # Análise temporal (simulada baseada em last_used)
         time_patterns = self._analyze_time_patterns(patterns)
         
         return {
-            "most_used_analyses": analysis_counts.most_common(5),
-            "usage_frequency": dict(analysis_counts),
+            "most_used_analyses": most_common,
+            "usage_frequency": dict(zip(uniques.tolist(), counts.tolist())),
             "total_interactions": total_frequency,
             "time_patterns": time_patterns,
-            "diversity_score": len(analysis_counts) / max(total_frequency, 1)
+            "diversity_score": len(uniques) / max(total_frequency, 1)
         }
     
     def _analyze_preferences(self, preferences: Dict[str, List]) -> Dict[str, Any]:
@@ -146,7 +557,7 @@ class RecommendationEngine:
         for pref_type, pref_list in preferences.items():
             if pref_list:
                 # Ordenar por confiança
-                sorted_prefs = sorted(pref_list, key=lambda x: x["confidence"], reverse=True)
+                sorted_prefs = nlargest(5, pref_list, key=lambda x: x["confidence"])
                 
                 if pref_type == "preferred_analysis":
                     analysis["preferred_analyses"] = [(p["value"], p["confidence"]) for p in sorted_prefs[:3]]
@@ -156,7 +567,7 @@ class RecommendationEngine:
                     analysis["preferred_metrics"] = [(p["value"], p["confidence"]) for p in sorted_prefs[:5]]
                 
                 # Score médio de confiança por tipo
-                avg_confidence = np.mean([p["confidence"] for p in pref_list])
+                avg_confidence = sum(p["confidence"] for p in pref_list) / len(pref_list)
                 analysis["confidence_scores"][pref_type] = avg_confidence
         
         return analysis
@@ -176,48 +587,57 @@ class RecommendationEngine:
         
         return time_analysis
     
-    def _calculate_interest_scores(self, patterns: List[Dict], preferences: Dict) -> Dict[str, float]:
+    def _calculate_interest_scores(self, patterns: List[Dict], preferences: Dict,
+                                   pattern_arrays: Optional[Tuple] = None) -> Dict[str, float]:
         """Calcula scores de interesse por categoria"""
-        scores = defaultdict(float)
+        if pattern_arrays is None:
+            pattern_arrays = self._pattern_arrays(patterns)
         
-        # Score baseado em padrões de uso
-        for pattern in patterns:
-            pattern_data = pattern.get("pattern_data", {})
-            analysis_type = pattern_data.get("analysis_type", "unknown")
-            frequency = pattern.get("frequency", 1)
-            
-            # Mapear para categorias
-            category = self._map_to_category(analysis_type)
-            scores[category] += frequency * 0.1
+        categories, weights = self._interest_contributions(preferences, pattern_arrays)
+        num_categories = len(_INTEREST_CATEGORIES)
+        scores = np.bincount(categories, weights=weights, minlength=num_categories)
+        seen = np.bincount(categories, minlength=num_categories) > 0
         
-        # Score baseado em preferências
-        for pref_type, pref_list in preferences.items():
-            for pref in pref_list:
-                category = self._map_to_category(pref["value"])
-                scores[category] += pref["confidence"] * 0.2
+        return self._normalize_interest_scores(scores, seen)
+    
+    def _interest_contributions(self, preferences: Dict,
+                                pattern_arrays: Tuple) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Categoria e peso de cada contribuição para os scores de interesse
         
-        # Normalizar scores
-        max_score = max(scores.values()) if scores else 1
-        normalized_scores = {k: v / max_score for k, v in scores.items()}
+        Padrões de uso contribuem com frequência * 0.1 e preferências com
+        confiança * 0.2. A categoria é calculada uma vez por tipo distinto.
+        """
+        codes, uniques, freqs = pattern_arrays
+        type_categories = np.array(
+            [_CATEGORY_INDEX[self._map_to_category(t)] for t in uniques], dtype=np.intp
+        )
+        
+        pref_items = [pref for pref_list in preferences.values() for pref in pref_list]
+        pref_categories = np.array(
+            [_CATEGORY_INDEX[self._map_to_category(pref["value"])] for pref in pref_items], dtype=np.intp
+        )
+        confidences = np.array([pref["confidence"] for pref in pref_items], dtype=np.float64)
         
-        return dict(normalized_scores)
+        categories = np.concatenate((type_categories[codes], pref_categories))
+        weights = np.concatenate((freqs * 0.1, confidences * 0.2))
+        return categories, weights
+    
+    def _normalize_interest_scores(self, scores: np.ndarray, seen: np.ndarray) -> Dict[str, float]:
+        """Normaliza os scores pelo máximo, mantendo apenas as categorias observadas"""
+        if not seen.any():
+            return {}
+        
+        max_score = scores.max() or 1
+        return {
+            _INTEREST_CATEGORIES[i]: float(scores[i] / max_score)
+            for i in np.flatnonzero(seen)
+        }
     
     def _map_to_category(self, item: str) -> str:
         """Mapeia item para categoria de interesse"""
-        item_lower = item.lower()
-        
-        if any(word in item_lower for word in ["compare", "periodo", "temporal"]):
-            return "temporal_analysis"
-        elif any(word in item_lower for word in ["segment", "grupo", "categoria"]):
-            return "segmentation"
-        elif any(word in item_lower for word in ["motivo", "razao", "count"]):
-            return "frequency_analysis"
-        elif any(word in item_lower for word in ["kpi", "metric", "performance"]):
-            return "performance_metrics"
-        elif any(word in item_lower for word in ["vendas", "receita", "financeiro"]):
-            return "financial_analysis"
-        else:
-            return "general_analysis"
+        match = _CATEGORY_RE.search(item)
+        return match.lastgroup if match else "general_analysis"
     
     def _detect_user_persona(self, usage_analysis: Dict, preference_analysis: Dict) -> str:
         """Detecta persona do usuário baseado nos padrões"""
@@ -248,6 +668,85 @@ class RecommendationEngine:
         else:
             return "balanced_user"
     
+    def cluster_personas(self, n_clusters: int = 6,
+                         sample_users: int = _PERSONA_CLUSTER_SAMPLE_USERS) -> Dict[str, Any]:
+        """
+        Aprende personas por k-means em duas etapas (execução periódica, ex.: noturna)
+        
+        O k-means é ajustado apenas com os usuários mais ativos; os demais são
+        atribuídos ao centróide mais próximo em lotes. Cada cluster recebe a
+        persona predominante entre seus membros.
+        
+        Args:
+            n_clusters: Número de clusters
+            sample_users: Máximo de usuários (mais ativos) usados no ajuste
+            
+        Returns:
+            Métricas do clustering
+        """
+        if not SKLEARN_AVAILABLE:
+            return {"error": "sklearn não disponível"}
+        
+        num_users = len(self._row_user_ids)
+        if num_users < n_clusters:
+            logger.warning("Dados insuficientes para clustering de personas")
+            return {"error": "Dados insuficientes"}
+        
+        interests = self._interest_matrix[:num_users].astype(np.float32) / _INTEREST_SCALE
+        
+        # Etapa 1: ajustar apenas com os usuários de maior atividade
+        by_activity = np.argsort(-self._interactions_arr[:num_users], kind="stable")
+        sample_rows = by_activity[:sample_users]
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=1024, n_init=3, random_state=42)
+        model.fit(interests[sample_rows])
+        centroids = model.cluster_centers_.astype(np.float32)
+        
+        labels = np.empty(num_users, dtype=np.intp)
+        labels[sample_rows] = model.labels_
+        
+        # Etapa 2: atribuir os demais ao centróide mais próximo, em lotes para limitar memória
+        rest_rows = by_activity[sample_users:]
+        for start in range(0, len(rest_rows), _PERSONA_ASSIGN_BATCH_ROWS):
+            batch = rest_rows[start:start + _PERSONA_ASSIGN_BATCH_ROWS]
+            labels[batch] = self._nearest_centroid(interests[batch], centroids)
+        
+        # Nomear cada cluster pela persona predominante entre os usuários da amostra
+        centroid_personas = np.full(n_clusters, _PERSONA_INDEX["balanced_user"], dtype=np.int8)
+        sample_personas = self._persona_arr[sample_rows]
+        for cluster in range(n_clusters):
+            members = sample_personas[model.labels_ == cluster]
+            if len(members):
+                centroid_personas[cluster] = np.bincount(members, minlength=len(_PERSONAS)).argmax()
+        
+        self.persona_centroids = centroids
+        self._centroid_personas = centroid_personas
+        
+        # Atualizar personas já conhecidas
+        self._persona_arr[:num_users] = centroid_personas[labels]
+        for user_id, row in self._user_id_to_row.items():
+            self.user_profiles[user_id].persona = _PERSONAS[self._persona_arr[row]]
+        
+        metrics = {
+            "n_clusters": n_clusters,
+            "training_samples": len(sample_rows),
+            "assigned_users": num_users,
+            "cluster_personas": [_PERSONAS[code] for code in centroid_personas],
+            "trained_at": datetime.now().isoformat()
+        }
+        logger.info(f"Personas agrupadas - {len(sample_rows)} usuários no ajuste, {num_users} atribuídos")
+        return metrics
+    
+    @staticmethod
+    def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Índice do centróide mais próximo (distância euclidiana) para cada vetor"""
+        distances = ((vectors[:, np.newaxis, :] - centroids[np.newaxis, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+    
+    def _nearest_persona(self, vectors: np.ndarray) -> List[str]:
+        """Persona do centróide mais próximo para cada vetor de interesse"""
+        clusters = self._nearest_centroid(vectors, self.persona_centroids)
+        return [_PERSONAS[code] for code in self._centroid_personas[clusters]]
+    
     def _calculate_activity_level(self, patterns: List[Dict]) -> str:
         """Calcula nível de atividade do usuário"""
         total_frequency = sum(pattern.get("frequency", 1) for pattern in patterns)
@@ -264,12 +763,10 @@ class RecommendationEngine:
     def _estimate_expertise_level(self, patterns: List[Dict], preferences: Dict) -> str:
         """Estima nível de expertise do usuário"""
         # Fatores para expertise
-        analysis_diversity = len(set(p.get("pattern_data", {}).get("analysis_type", "") for p in patterns))
+        analysis_diversity = len({(p.get("pattern_data") or _EMPTY_DICT).get("analysis_type", "") for p in patterns})
         total_interactions = sum(p.get("frequency", 1) for p in patterns)
-        avg_confidence = np.mean([
-            np.mean([pref["confidence"] for pref in pref_list])
-            for pref_list in preferences.values() if pref_list
-        ]) if preferences else 0.5
+        confidences = [pref["confidence"] for pref_list in preferences.values() for pref in pref_list]
+        avg_confidence = (sum(confidences) / len(confidences)) if confidences else 0.5
         
         expertise_score = (
             (analysis_diversity / 10) * 0.3 +
@@ -298,12 +795,12 @@ class RecommendationEngine:
             Lista de recomendações de análises
         """
         # Construir/atualizar perfil do usuário
-        profile = self.build_user_profile(user_id)
+        profile = self._build_profile(user_id)
         
         recommendations = []
         
         # Recomendações baseadas na persona
-        persona_recs = self._get_persona_recommendations(profile["persona"])
+        persona_recs = self._get_persona_recommendations(profile.persona)
         recommendations.extend(persona_recs)
         
         # Recomendações baseadas em padrões de uso
@@ -319,54 +816,22 @@ class RecommendationEngine:
         collaborative_recs = self._get_collaborative_recommendations(user_id, profile)
         recommendations.extend(collaborative_recs)
         
-        # Remover duplicatas e ordenar por relevância
-        unique_recs = self._deduplicate_and_rank(recommendations)
+        # Remover duplicatas e manter as 10 mais relevantes
+        unique_recs = self._deduplicate_and_rank(recommendations, limit=10)
         
         logger.info(f"Geradas {len(unique_recs)} recomendações para usuário {user_id}")
-        return unique_recs[:10]  # Top 10 recomendações
+        return unique_recs
     
     def _get_persona_recommendations(self, persona: str) -> List[Dict[str, Any]]:
         """Gera recomendações baseadas na persona do usuário"""
-        persona_mappings = {
-            "explorer_analyst": [
-                {"type": "custom_kpis", "reason": "Explore novos KPIs personalizados", "priority": 0.8},
-                {"type": "trend_analysis", "reason": "Analise tendências nos seus dados", "priority": 0.7},
-                {"type": "correlation_analysis", "reason": "Descubra correlações interessantes", "priority": 0.6}
-            ],
-            "focused_specialist": [
-                {"type": "deep_dive_analysis", "reason": "Análise aprofundada da sua área", "priority": 0.9},
-                {"type": "benchmark_analysis", "reason": "Compare com benchmarks do setor", "priority": 0.7}
-            ],
-            "casual_user": [
-                {"type": "summary", "reason": "Visão geral dos seus dados", "priority": 0.9},
-                {"type": "compare_periods", "reason": "Compare períodos recentes", "priority": 0.8},
-                {"type": "top_insights", "reason": "Principais insights automáticos", "priority": 0.7}
-            ],
-            "performance_analyst": [
-                {"type": "kpi_dashboard", "reason": "Dashboard de KPIs atualizado", "priority": 0.9},
-                {"type": "performance_trends", "reason": "Tendências de performance", "priority": 0.8},
-                {"type": "goal_tracking", "reason": "Acompanhamento de metas", "priority": 0.7}
-            ],
-            "trend_analyst": [
-                {"type": "time_series_analysis", "reason": "Análise de séries temporais", "priority": 0.9},
-                {"type": "seasonal_patterns", "reason": "Padrões sazonais", "priority": 0.8},
-                {"type": "forecast", "reason": "Previsões baseadas em tendências", "priority": 0.7}
-            ],
-            "balanced_user": [
-                {"type": "compare_periods", "reason": "Comparação de períodos", "priority": 0.8},
-                {"type": "segment_groups", "reason": "Segmentação por grupos", "priority": 0.7},
-                {"type": "summary", "reason": "Resumo geral", "priority": 0.6}
-            ]
-        }
-        
-        return persona_mappings.get(persona, persona_mappings["balanced_user"])
+        # Cópias rasas: o resultado segue para respostas/logs serializados em JSON
+        return [dict(rec) for rec in _persona_recs_cached(persona)]
     
-    def _get_pattern_based_recommendations(self, profile: Dict) -> List[Dict[str, Any]]:
+    def _get_pattern_based_recommendations(self, profile: UserProfile) -> List[Dict[str, Any]]:
         """Gera recomendações baseadas em padrões de uso"""
         recommendations = []
         
-        usage_patterns = profile.get("usage_patterns", {})
-        most_used = usage_patterns.get("most_used_analyses", [])
+        most_used = profile.usage_patterns.get("most_used_analyses", [])
         
         # Recomendar variações das análises mais usadas
         for analysis, frequency in most_used[:3]:
@@ -384,8 +849,8 @@ class RecommendationEngine:
                 })
         
         # Recomendar análises complementares
-        interest_scores = profile.get("interest_scores", {})
-        for category, score in sorted(interest_scores.items(), key=lambda x: x[1], reverse=True)[:2]:
+        interest_scores = profile.interest_dict()
+        for category, score in nlargest(2, interest_scores.items(), key=lambda x: x[1]):
             if category == "temporal_analysis":
                 recommendations.append({
                     "type": "trend_analysis",
@@ -401,30 +866,30 @@ class RecommendationEngine:
         
         return recommendations
     
-    def _get_context_based_recommendations(self, profile: Dict, context: Dict) -> List[Dict[str, Any]]:
+    def _get_context_based_recommendations(self, profile: UserProfile, context: Dict) -> List[Dict[str, Any]]:
         """Gera recomendações baseadas no contexto atual"""
         recommendations = []
         
-        available_columns = context.get("available_columns", [])
+        available_columns = frozenset(context.get("available_columns", []))
         data_size = context.get("data_size", 0)
         data_type = context.get("data_type", "")
         
         # Recomendações baseadas nas colunas disponíveis
-        if "data" in available_columns or "timestamp" in available_columns:
+        if not available_columns.isdisjoint(_TIME_COLUMNS):
             recommendations.append({
                 "type": "time_series_analysis",
                 "reason": "Dados temporais detectados",
                 "priority": 0.8
             })
         
-        if any(col in ["grupo", "categoria", "tipo"] for col in available_columns):
+        if not available_columns.isdisjoint(_SEGMENT_COLUMNS):
             recommendations.append({
                 "type": "segment_groups",
                 "reason": "Colunas categóricas disponíveis para segmentação",
                 "priority": 0.7
             })
         
-        if any(col in ["motivo", "razao"] for col in available_columns):
+        if not available_columns.isdisjoint(_REASON_COLUMNS):
             recommendations.append({
                 "type": "count_reasons",
                 "reason": "Coluna de motivos detectada",
@@ -447,7 +912,7 @@ class RecommendationEngine:
         
         return recommendations
     
-    def _get_collaborative_recommendations(self, user_id: str, profile: Dict) -> List[Dict[str, Any]]:
+    def _get_collaborative_recommendations(self, user_id: str, profile: UserProfile) -> List[Dict[str, Any]]:
         """Gera recomendações baseadas em usuários similares"""
         recommendations = []
         
@@ -460,8 +925,7 @@ class RecommendationEngine:
                 continue
             
             # Recomendar análises populares entre usuários similares
-            similar_patterns = similar_profile.get("usage_patterns", {})
-            most_used = similar_patterns.get("most_used_analyses", [])
+            most_used = similar_profile.usage_patterns.get("most_used_analyses", [])
             
             for analysis, frequency in most_used[:2]:
                 recommendations.append({
@@ -472,47 +936,38 @@ class RecommendationEngine:
         
         return recommendations
     
-    def _find_similar_users(self, user_id: str, profile: Dict) -> List[Tuple[str, float]]:
-        """Encontra usuários similares baseado no perfil"""
-        similarities = []
+    def _find_similar_users(self, user_id: str, profile: UserProfile, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Encontra usuários similares baseado no perfil (varredura vetorizada na tabela SoA)"""
+        num_users = len(self._row_user_ids)
+        if num_users == 0:
+            return []
         
-        for other_user_id, other_profile in self.user_profiles.items():
-            if other_user_id == user_id:
-                continue
-            
-            similarity = self._calculate_profile_similarity(profile, other_profile)
-            if similarity > 0.3:  # Threshold mínimo
-                similarities.append((other_user_id, similarity))
+        personas = self._persona_arr[:num_users]
+        activities = self._activity_arr[:num_users]
+        expertises = self._expertise_arr[:num_users]
+        interests = self._interest_matrix[:num_users]
         
-        return sorted(similarities, key=lambda x: x[1], reverse=True)
-    
-    def _calculate_profile_similarity(self, profile1: Dict, profile2: Dict) -> float:
-        """Calcula similaridade entre dois perfis de usuário"""
         # Similaridade de persona
-        persona_sim = 1.0 if profile1.get("persona") == profile2.get("persona") else 0.0
-        
-        # Similaridade de interesse
-        interests1 = profile1.get("interest_scores", {})
-        interests2 = profile2.get("interest_scores", {})
-        
-        common_interests = set(interests1.keys()) & set(interests2.keys())
-        if common_interests:
-            interest_sim = np.mean([
-                1 - abs(interests1[interest] - interests2[interest])
-                for interest in common_interests
-            ])
-        else:
-            interest_sim = 0.0
-        
-        # Similaridade de atividade
-        activity1 = profile1.get("activity_level", "low")
-        activity2 = profile2.get("activity_level", "low")
-        activity_sim = 1.0 if activity1 == activity2 else 0.5
-        
-        # Similaridade de expertise
-        expertise1 = profile1.get("expertise_level", "beginner")
-        expertise2 = profile2.get("expertise_level", "beginner")
-        expertise_sim = 1.0 if expertise1 == expertise2 else 0.5
+        persona_sim = (personas == _PERSONA_INDEX[profile.persona]).astype(np.float32)
+        
+        # Similaridade de interesse: cosseno das frequências por tipo de análise (CSR, X @ x.T)
+        interest_sim = self._usage_similarity(user_id)
+        if interest_sim is None:
+            # Sem scipy/histórico: média de 1 - |a - b| sobre as categorias em comum,
+            # calculada em inteiros na escala quantizada e dividida por 255 uma única vez
+            query = _quantize_interests(profile.interest_scores)
+            common = (interests > 0) & (query > 0)
+            num_common = common.sum(axis=1)
+            diff = np.abs(interests.astype(np.int16) - query.astype(np.int16))
+            closeness = np.where(common, _INTEREST_SCALE - diff, 0).sum(axis=1)
+            interest_sim = np.divide(
+                closeness, num_common * float(_INTEREST_SCALE),
+                out=np.zeros(num_users, dtype=np.float64), where=num_common > 0
+            )
+        
+        # Similaridade de atividade e expertise
+        activity_sim = np.where(activities == _ACTIVITY_INDEX[profile.activity_level], 1.0, 0.5)
+        expertise_sim = np.where(expertises == _EXPERTISE_INDEX[profile.expertise_level], 1.0, 0.5)
         
         # Média ponderada
         total_similarity = (
@@ -522,23 +977,33 @@ class RecommendationEngine:
             expertise_sim * 0.15
         )
         
-        return total_similarity
+        candidates = total_similarity > 0.3  # Threshold mínimo
+        own_row = self._user_id_to_row.get(user_id)
+        if own_row is not None:
+            candidates[own_row] = False
+        
+        rows = np.flatnonzero(candidates)
+        if len(rows) > top_k:
+            # Seleção parcial O(n) dos top-K antes de ordenar apenas esses
+            rows = rows[np.argpartition(-total_similarity[rows], top_k - 1)[:top_k]]
+            rows.sort()
+        rows = rows[np.argsort(-total_similarity[rows], kind="stable")]
+        return [(self._row_user_ids[row], float(total_similarity[row])) for row in rows]
     
-    def _deduplicate_and_rank(self, recommendations: List[Dict]) -> List[Dict]:
-        """Remove duplicatas e ordena recomendações por relevância"""
-        # Agrupar por tipo
-        grouped = defaultdict(list)
+    def _deduplicate_and_rank(self, recommendations: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+        """Remove duplicatas e ordena recomendações por relevância (opcionalmente só as top `limit`)"""
+        # Manter apenas a melhor de cada tipo (em caso de empate, a primeira)
+        best: Dict[str, Dict] = {}
         for rec in recommendations:
-            grouped[rec["type"]].append(rec)
-        
-        # Manter apenas a melhor de cada tipo
-        unique_recs = []
-        for rec_type, recs in grouped.items():
-            best_rec = max(recs, key=lambda x: x["priority"])
-            unique_recs.append(best_rec)
+            rec_type = rec["type"]
+            current = best.get(rec_type)
+            if current is None or rec["priority"] > current["priority"]:
+                best[rec_type] = rec
         
         # Ordenar por prioridade
-        return sorted(unique_recs, key=lambda x: x["priority"], reverse=True)
+        if limit is not None:
+            return nlargest(limit, best.values(), key=itemgetter("priority"))
+        return sorted(best.values(), key=itemgetter("priority"), reverse=True)
     
     def recommend_templates(self, user_id: str, analysis_type: str = None) -> List[Dict[str, Any]]:
         """
@@ -553,22 +1018,13 @@ class RecommendationEngine:
         """
         profile = self.user_profiles.get(user_id)
         if not profile:
-            profile = self.build_user_profile(user_id)
+            profile = self._build_profile(user_id)
         
         recommendations = []
         
         # Templates baseados na persona
-        persona = profile.get("persona", "balanced_user")
-        persona_templates = {
-            "explorer_analyst": ["template_dashboard.pptx", "template_detailed.pptx"],
-            "focused_specialist": ["template_executive.pptx", "template_focused.pptx"],
-            "casual_user": ["template_simple.pptx", "template_summary.pptx"],
-            "performance_analyst": ["template_kpi.pptx", "template_metrics.pptx"],
-            "trend_analyst": ["template_trends.pptx", "template_temporal.pptx"],
-            "balanced_user": ["template_relatorio.pptx", "template_general.pptx"]
-        }
-        
-        for template in persona_templates.get(persona, ["template_relatorio.pptx"]):
+        persona = profile.persona
+        for template in _PERSONA_TEMPLATES.get(persona, ("template_relatorio.pptx",)):
             recommendations.append({
                 "template": template,
                 "reason": f"Recomendado para {persona}",
@@ -577,14 +1033,7 @@ class RecommendationEngine:
         
         # Templates baseados no tipo de análise
         if analysis_type:
-            analysis_templates = {
-                "compare_periods": ["template_comparison.pptx", "template_temporal.pptx"],
-                "segment_groups": ["template_segmentation.pptx", "template_categories.pptx"],
-                "count_reasons": ["template_frequency.pptx", "template_ranking.pptx"],
-                "custom_kpis": ["template_kpi.pptx", "template_metrics.pptx"]
-            }
-            
-            for template in analysis_templates.get(analysis_type, []):
+            for template in _ANALYSIS_TEMPLATES.get(analysis_type, ()):
                 recommendations.append({
                     "template": template,
                     "reason": f"Otimizado para {analysis_type}",
@@ -592,8 +1041,7 @@ class RecommendationEngine:
                 })
         
         # Templates baseados em preferências
-        preferences = profile.get("preferences", {})
-        preferred_templates = preferences.get("preferred_templates", [])
+        preferred_templates = profile.preferences.get("preferred_templates", [])
         
         for template, confidence in preferred_templates[:2]:
             recommendations.append({
@@ -602,10 +1050,8 @@ class RecommendationEngine:
                 "priority": confidence
             })
         
-        # Remover duplicatas e ordenar
-        unique_templates = self._deduplicate_and_rank(recommendations)
-        
-        return unique_templates[:5]  # Top 5 templates
+        # Remover duplicatas e manter os 5 mais relevantes
+        return self._deduplicate_and_rank(recommendations, limit=5)
     
     def generate_proactive_alerts(self, user_id: str) -> List[Dict[str, Any]]:
         """
@@ -624,45 +1070,48 @@ class RecommendationEngine:
         alerts = []
         
         # Alertas baseados na atividade
-        activity_level = profile.get("activity_level", "low")
+        activity_level = profile.activity_level
         if activity_level == "very_low":
             alerts.append({
                 "type": "engagement",
                 "message": "Que tal explorar uma nova análise hoje?",
                 "action": "recommend_analyses",
-                "priority": "medium"
+                "priority": "medium",
+                "priority_rank": _ALERT_PRIORITY_RANK["medium"]
             })
         
         # Alertas baseados na expertise
-        expertise_level = profile.get("expertise_level", "beginner")
+        expertise_level = profile.expertise_level
         if expertise_level == "beginner":
             alerts.append({
                 "type": "learning",
                 "message": "Dica: Experimente a análise de segmentação para insights mais profundos",
                 "action": "tutorial_segmentation",
-                "priority": "low"
+                "priority": "low",
+                "priority_rank": _ALERT_PRIORITY_RANK["low"]
             })
         elif expertise_level == "expert":
             alerts.append({
                 "type": "advanced_feature",
                 "message": "Nova funcionalidade: Análise preditiva disponível!",
                 "action": "try_prediction",
-                "priority": "high"
+                "priority": "high",
+                "priority_rank": _ALERT_PRIORITY_RANK["high"]
             })
         
         # Alertas baseados em padrões temporais
-        usage_patterns = profile.get("usage_patterns", {})
-        time_patterns = usage_patterns.get("time_patterns", {})
+        time_patterns = profile.usage_patterns.get("time_patterns", {})
         
         if time_patterns.get("usage_consistency", 0) < 0.3:
             alerts.append({
                 "type": "consistency",
                 "message": "Análises regulares podem revelar tendências importantes",
                 "action": "schedule_analysis",
-                "priority": "medium"
+                "priority": "medium",
+                "priority_rank": _ALERT_PRIORITY_RANK["medium"]
             })
         
-        return sorted(alerts, key=lambda x: {"high": 3, "medium": 2, "low": 1}[x["priority"]], reverse=True)
+        return sorted(alerts, key=itemgetter("priority_rank"), reverse=True)
     
     def get_personalization_settings(self, user_id: str) -> Dict[str, Any]:
         """
@@ -676,7 +1125,7 @@ class RecommendationEngine:
         """
         profile = self.user_profiles.get(user_id)
         if not profile:
-            profile = self.build_user_profile(user_id)
+            profile = self._build_profile(user_id)
         
         settings = {
             "dashboard_layout": self._get_dashboard_layout(profile),
@@ -689,9 +1138,9 @@ class RecommendationEngine:
         
         return settings
     
-    def _get_dashboard_layout(self, profile: Dict) -> str:
+    def _get_dashboard_layout(self, profile: UserProfile) -> str:
         """Determina layout ideal do dashboard"""
-        persona = profile.get("persona", "balanced_user")
+        persona = profile.persona
         
         layout_mapping = {
             "explorer_analyst": "detailed",
@@ -704,15 +1153,14 @@ class RecommendationEngine:
         
         return layout_mapping.get(persona, "balanced")
     
-    def _get_default_analyses(self, profile: Dict) -> List[str]:
+    def _get_default_analyses(self, profile: UserProfile) -> List[str]:
         """Determina análises padrão para o usuário"""
-        usage_patterns = profile.get("usage_patterns", {})
-        most_used = usage_patterns.get("most_used_analyses", [])
+        most_used = profile.usage_patterns.get("most_used_analyses", [])
         
         if most_used:
             return [analysis for analysis, _ in most_used[:3]]
         else:
-            persona = profile.get("persona", "balanced_user")
+            persona = profile.persona
             defaults = {
                 "explorer_analyst": ["custom_kpis", "trend_analysis", "segment_groups"],
                 "focused_specialist": ["compare_periods", "custom_kpis"],
@@ -723,10 +1171,10 @@ class RecommendationEngine:
             }
             return defaults.get(persona, ["compare_periods", "summary"])
     
-    def _get_notification_preferences(self, profile: Dict) -> Dict[str, bool]:
+    def _get_notification_preferences(self, profile: UserProfile) -> Dict[str, bool]:
         """Determina preferências de notificação"""
-        activity_level = profile.get("activity_level", "low")
-        expertise_level = profile.get("expertise_level", "beginner")
+        activity_level = profile.activity_level
+        expertise_level = profile.expertise_level
         
         if activity_level == "high":
             return {
@@ -751,9 +1199,9 @@ class RecommendationEngine:
                 "weekly_summary": True
             }
     
-    def _get_ui_complexity(self, profile: Dict) -> str:
+    def _get_ui_complexity(self, profile: UserProfile) -> str:
         """Determina nível de complexidade da UI"""
-        expertise_level = profile.get("expertise_level", "beginner")
+        expertise_level = profile.expertise_level
         
         complexity_mapping = {
             "beginner": "simple",
@@ -0,0 +1,132 @@
+"""
+CÓRTEX BI - Rotas comuns aos servidores
+Endpoints /, /health e /list-files compartilhados por main_ai e main_ai_final
+
+Cada app inclui o router e define em app.state:
+- root_payload: conteúdo estático de GET /
+- health_payload: conteúdo estático de GET /health (além de status e timestamp)
+- list_files: função sem argumentos que monta a resposta de GET /list-files
+
+Também define NumpyORJSONResponse, a classe de resposta padrão dos apps.
+
+Usa apenas FastAPI, orjson e a biblioteca padrão (compatível com a versão básica).
+"""
+
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
+
+router = APIRouter()
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def orjson_default(obj: Any) -> Any:
+    """Tipos que o orjson não serializa sozinho (ex.: pd.Timestamp, subclasse de datetime)"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError
+
+
+class NumpyORJSONResponse(ORJSONResponse):
+    """Resposta JSON via orjson que serializa escalares/arrays numpy nativamente"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=orjson_default, option=ORJSON_OPTIONS)
+
+# Listagens em cache: (diretório, extensões) -> (mtime_ns do diretório, instante da varredura, arquivos)
+_listing_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[int, float, List[Dict]]] = {}
+
+# Validade máxima de uma listagem em segundos - EDITE AQUI
+# Sobrescrever um arquivo não muda o mtime do diretório e invalidate_listing só
+# vale no processo que gravou: os outros workers reveem size/modified após o TTL
+LISTING_TTL = 2.0
+
+
+@lru_cache(maxsize=1)
+def _iso_at(sec: int) -> str:
+    """Timestamp ISO com resolução de 1s, formatado uma vez por segundo"""
+    return datetime.fromtimestamp(sec).isoformat()
+
+
+def iso_now() -> str:
+    """Timestamp ISO atual (resolução de 1s)"""
+    return _iso_at(int(time.time()))
+
+
+def scan_directory(directory: str, suffixes: Tuple[str, ...]) -> List[Dict]:
+    """
+    Lista os arquivos do diretório com as extensões informadas.
+
+    Um único stat do diretório por chamada: a varredura (os.scandir, que
+    reaproveita o stat de cada entrada) só é refeita quando o mtime muda
+    ou a listagem tem mais de LISTING_TTL segundos.
+
+    Args:
+        directory (str): Diretório a listar
+        suffixes (tuple): Extensões aceitas, ex.: ('.csv', '.xlsx')
+
+    Returns:
+        List[Dict]: name, size e modified_epoch de cada arquivo ([] se o diretório não existir)
+    """
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return []
+
+    key = (directory, suffixes)
+    now = time.monotonic()
+    cached = _listing_cache.get(key)
+    if cached is not None and cached[0] == mtime_ns and now - cached[1] < LISTING_TTL:
+        return cached[2]
+
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1] in suffixes and entry.is_file():
+                st = entry.stat()
+                files.append({
+                    "name": entry.name,
+                    "size": st.st_size,
+                    "modified_epoch": int(st.st_mtime)
+                })
+
+    _listing_cache[key] = (mtime_ns, now, files)
+    return files
+
+
+def invalidate_listing(directory: Optional[str] = None):
+    """
+    Descarta listagens em cache (de um diretório ou todas).
+    Necessário ao sobrescrever um arquivo, que não altera o mtime do diretório.
+    """
+    for key in [k for k in _listing_cache if directory is None or k[0] == directory]:
+        _listing_cache.pop(key, None)
+
+
+@router.get("/")
+async def root(request: Request):
+    """Endpoint raiz com informações do sistema"""
+    return {**request.app.state.root_payload, "timestamp": iso_now()}
+
+
+@router.get("/health")
+async def health_check(request: Request):
+    """Verificação de saúde do sistema"""
+    return {
+        "status": "healthy",
+        "timestamp": iso_now(),
+        **request.app.state.health_payload
+    }
+
+
+@router.get("/list-files")
+async def list_files(request: Request):
+    """Lista arquivos disponíveis para análise"""
+    return request.app.state.list_files()
@@ -15,20 +15,48 @@ Instruções para personalização:
 """
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
+import aiofiles
 import os
-import json
+import re
+import time
+import orjson
 import tempfile
-import shutil
-from typing import Dict, List, Optional, Union, Any
+import hashlib
+from typing import Dict, List, Optional, Union, Any, Tuple, Literal, Annotated
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
+import numpy as np
 from loguru import logger
-import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Imports opcionais - não quebram se não estiverem disponíveis
+try:
+    import pyarrow  # noqa: F401 - engine do cache parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# uvloop não existe no Windows: lá o servidor usa o loop asyncio padrão
+try:
+    import uvloop  # noqa: F401 - event loop do uvicorn em produção
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
 # Importa módulos do agente
 from agents.data_loader import DataLoader
@@ -36,7 +64,14 @@ from agents.analytics_engine import AnalyticsEngine
 from agents.pptx_generator import PPTXGenerator
 
 # Configuração do logger
-logger.add("logs/analytics_agent.log", rotation="1 day", retention="30 days")
+# Tracebacks formatados apenas no sink; em produção sem valores de variáveis (diagnose)
+logger.add(
+    "logs/analytics_agent.log",
+    rotation="1 day",
+    retention="30 days",
+    backtrace=True,
+    diagnose=os.getenv("ENV") != "prod"
+)
 
 # Inicializa FastAPI
 app = FastAPI(
@@ -44,7 +79,8 @@ app = FastAPI(
     description="Agente de Analytics com integração Microsoft Copilot M365",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configuração CORS - EDITE AQUI conforme necessário
@@ -64,66 +100,386 @@ data_loader = DataLoader()
 analytics_engine = AnalyticsEngine()
 pptx_generator = PPTXGenerator()
 
+# Loader por extensão de arquivo - EDITE AQUI para suportar novos formatos
+_LOADERS = {
+    '.csv': data_loader.load_csv,
+    '.xlsx': data_loader.load_excel,
+    '.xls': data_loader.load_excel,
+}
+
 # Configurações globais - EDITE AQUI conforme necessário
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "output"
 TEMPLATE_DIR = "templates"
 DATA_DIR = "data"
+UPLOAD_CHUNK_SIZE = 1 << 20  # Tamanho do bloco de gravação do upload (1 MB)
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # Tamanho do bloco de leitura do download (1 MB)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))  # Threads para análises
 
 # Cria diretórios se não existirem
 for directory in [UPLOAD_DIR, OUTPUT_DIR, TEMPLATE_DIR, DATA_DIR]:
     os.makedirs(directory, exist_ok=True)
 
+# Pool limitado para parsing e análises: mantém o event loop livre durante o trabalho pesado.
+# Threads (e não processos) para compartilhar o cache de DataFrames abaixo sem serialização;
+# o pandas libera o GIL na maior parte das operações numéricas e de parsing.
+_analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+
+# Cache de DataFrames carregados - EDITE AQUI o número de arquivos mantidos em memória
+LOAD_CACHE_SIZE = 32
+# Um lock por (arquivo, mtime, tamanho): só cargas duplicadas do mesmo arquivo
+# esperam umas pelas outras; _load_lock protege apenas o dicionário
+_load_lock = threading.Lock()
+_key_locks: Dict[Tuple[str, int, int], threading.Lock] = {}
+
+
+# Diretório das cópias parquet - EDITE AQUI (fora das pastas listadas em /list-files)
+PARQUET_CACHE_DIR = os.path.join(OUTPUT_DIR, "_cache")
+
+
+def _parquet_sidecar(file_path: str) -> str:
+    """Caminho da cópia colunar do arquivo, nomeada pelo hash do caminho absoluto."""
+    digest = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+    return os.path.join(PARQUET_CACHE_DIR, f"{digest}.parquet")
+
+
+def _load_from_source(file_path: str, mtime_ns: int) -> pd.DataFrame:
+    """
+    Lê o arquivo original, usando a cópia parquet quando ela for mais recente
+    que a fonte. Na primeira leitura grava a cópia para as próximas.
+    """
+    sidecar = _parquet_sidecar(file_path)
+    
+    if PYARROW_AVAILABLE:
+        try:
+            sidecar_stat = os.stat(sidecar)
+            if sidecar_stat.st_mtime_ns >= mtime_ns:
+                df = pd.read_parquet(sidecar, engine="pyarrow")
+                # Metadados do DataLoader não são persistidos no parquet
+                df.attrs['loaded_at'] = datetime.fromtimestamp(sidecar_stat.st_mtime)
+                df.attrs['source'] = 'DataLoader'
+                return df
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Cache parquet inválido para {file_path}: {str(e)}")
+    
+    file_extension = Path(file_path).suffix.lower()
+    loader = _LOADERS.get(file_extension)
+    if loader is None:
+        raise ValueError(f"Tipo de arquivo não suportado: {file_extension}")
+    df = loader(file_path)
+    
+    if PYARROW_AVAILABLE:
+        try:
+            # Cópia rasa sem attrs: loaded_at (datetime) não é serializável nos metadados
+            sidecar_df = df.copy(deep=False)
+            sidecar_df.attrs = {}
+            # Grava em arquivo temporário e troca atomicamente: leitores
+            # concorrentes nunca veem um parquet pela metade
+            os.makedirs(PARQUET_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=PARQUET_CACHE_DIR, suffix=".tmp")
+            os.close(fd)
+            try:
+                sidecar_df.to_parquet(tmp_path, engine="pyarrow", compression="snappy")
+                os.replace(tmp_path, sidecar)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            # Colunas com tipos mistos não são serializáveis em parquet
+            logger.warning(f"Não foi possível gravar cache parquet de {file_path}: {str(e)}")
+    
+    return df
+
+
+@lru_cache(maxsize=LOAD_CACHE_SIZE)
+def _load_impl(file_path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """
+    Faz o parsing do arquivo. mtime_ns e size entram apenas na chave do cache,
+    de modo que um arquivo sobrescrito é recarregado.
+    """
+    return _load_from_source(file_path, mtime_ns)
+
+
+def _cached_load(file_path: str) -> pd.DataFrame:
+    """
+    Carrega um arquivo de dados reaproveitando o DataFrame já processado.
+    
+    O DataFrame retornado é compartilhado entre requisições e deve ser
+    tratado como somente leitura.
+    
+    Args:
+        file_path: Caminho para o arquivo de dados
+        
+    Returns:
+        pd.DataFrame: Dados carregados
+    """
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    with _load_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    
+    try:
+        with key_lock:
+            return _load_impl(*key)
+    finally:
+        # Quem chegar depois encontra o resultado já no lru_cache
+        with _load_lock:
+            if _key_locks.get(key) is key_lock:
+                del _key_locks[key]
+
+
+# Modelos Pydantic para requisições
+class ComparePeriodsParams(BaseModel):
+    period1: Union[int, str]
+    period2: Union[int, str]
+    metrics: List[str] = ['total', 'media', 'crescimento']
+
+class SegmentGroupsParams(BaseModel):
+    group_columns: List[str] = Field(min_length=1)
+    metrics: List[str] = ['total', 'media', 'count']
+
+class CountReasonsParams(BaseModel):
+    reason_column: Optional[str] = None
+
+class CustomKpisParams(BaseModel):
+    kpi_definitions: Dict[str, Any] = Field(min_length=1)
+
+class _FileAnalysis(BaseModel):
+    file_path: str
+
+class ComparePeriodsRequest(_FileAnalysis):
+    analysis_type: Literal["compare_periods"]
+    parameters: ComparePeriodsParams
+
+class SegmentGroupsRequest(_FileAnalysis):
+    analysis_type: Literal["segment_groups"]
+    parameters: SegmentGroupsParams
+
+class CountReasonsRequest(_FileAnalysis):
+    analysis_type: Literal["count_reasons"]
+    parameters: CountReasonsParams = CountReasonsParams()
+
+class CustomKpisRequest(_FileAnalysis):
+    analysis_type: Literal["custom_kpis"]
+    parameters: CustomKpisParams
+
+# União discriminada por analysis_type: o validador escolhe o modelo direto pelo campo
+AnalyzeRequest = Annotated[
+    Union[ComparePeriodsRequest, SegmentGroupsRequest, CountReasonsRequest, CustomKpisRequest],
+    Field(discriminator="analysis_type")
+]
+_analyze_request_adapter = TypeAdapter(AnalyzeRequest)
+
+class GeneratePptxRequest(BaseModel):
+    template_path: str
+    data: Dict[str, Any]
+    output_filename: str
+
+class AnalyzeAndGenerateRequest(BaseModel):
+    analysis: AnalyzeRequest
+    template_path: str
+    output_filename: str
+
+class DownloadFileResponse(FileResponse):
+    """
+    FileResponse com blocos maiores: reduz o número de syscalls ao enviar
+    apresentações grandes. Servidores com a extensão ASGI pathsend
+    continuam enviando o arquivo direto pelo kernel.
+    """
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+# Cache do conteúdo dos templates PPTX: caminho -> (mtime_ns, bytes)
+_template_cache: Dict[str, Tuple[int, bytes]] = {}
+_template_lock = threading.Lock()
+
+
+def _read_template(template_path: str) -> Tuple[int, bytes]:
+    """
+    Retorna o conteúdo do template, relendo do disco apenas quando o arquivo muda.
+    
+    Args:
+        template_path: Caminho para o template PPTX
+        
+    Returns:
+        Tuple[int, bytes]: mtime_ns do arquivo e seu conteúdo
+    """
+    mtime_ns = os.stat(template_path).st_mtime_ns
+    with _template_lock:
+        cached = _template_cache.get(template_path)
+        if cached is None or cached[0] != mtime_ns:
+            with open(template_path, "rb") as template_file:
+                cached = (mtime_ns, template_file.read())
+            _template_cache[template_path] = cached
+    return cached
+
+
+@lru_cache(maxsize=LOAD_CACHE_SIZE)
+def _template_placeholders(template_path: str, mtime_ns: int) -> Optional[Tuple[str, ...]]:
+    """
+    Lista de placeholders de um template. Depende apenas do conteúdo do
+    arquivo, por isso é memoizada por (caminho, mtime_ns).
+    Retorna None se o template não puder ser carregado.
+    """
+    _, template_bytes = _read_template(template_path)
+    temp_generator = PPTXGenerator()
+    if not temp_generator.load_template_bytes(template_bytes, template_path):
+        return None
+    return tuple(temp_generator.get_placeholders_list())
+
+# Intenções do Copilot em ordem de prioridade - EDITE AQUI para adicionar mais tipos de query
+COPILOT_INTENTS = (
+    ("compare_periods", ("comparar períodos", "compare periods")),
+    ("segment_groups", ("segmentar", "segment")),
+)
+
+# palavra-chave -> (prioridade, tipo de análise)
+_COPILOT_KEYWORDS = {
+    keyword: (priority, intent)
+    for priority, (intent, keywords) in enumerate(COPILOT_INTENTS)
+    for keyword in keywords
+}
+
+if AHOCORASICK_AVAILABLE:
+    # Autômato compilado uma vez: uma única varredura da query encontra todas as palavras-chave
+    _copilot_automaton = ahocorasick.Automaton()
+    for _keyword, _value in _COPILOT_KEYWORDS.items():
+        _copilot_automaton.add_word(_keyword, _value)
+    _copilot_automaton.make_automaton()
+else:
+    # Fallback: lookahead permite encontrar palavras-chave sobrepostas numa só varredura
+    _copilot_pattern = re.compile(
+        "(?=(" + "|".join(re.escape(k) for k in sorted(_COPILOT_KEYWORDS, key=len, reverse=True)) + "))"
+    )
+
+
+def _route_copilot_query(query: str) -> Optional[str]:
+    """
+    Identifica o tipo de análise pedido na query do Copilot.
+    Havendo mais de uma intenção na query, vale a de maior prioridade.
+    
+    Args:
+        query: Texto da requisição
+        
+    Returns:
+        Optional[str]: Tipo de análise ou None se nenhuma palavra-chave for encontrada
+    """
+    query_lower = query.lower()
+    if AHOCORASICK_AVAILABLE:
+        matches = (value for _, value in _copilot_automaton.iter(query_lower))
+    else:
+        matches = (_COPILOT_KEYWORDS[m.group(1)] for m in _copilot_pattern.finditer(query_lower))
+    
+    best = min(matches, default=None)
+    return best[1] if best else None
+
+# Resposta do endpoint raiz pré-serializada; apenas o timestamp muda
+_ROOT_TEMPLATE = orjson.dumps({
+    "message": "Analytics Agent - Servidor ativo",
+    "version": "1.0.0",
+    "status": "running",
+    "endpoints": {
+        "docs": "/docs",
+        "health": "/health",
+        "upload": "/upload",
+        "analyze": "/analyze",
+        "generate_pptx": "/generate-pptx",
+        "download": "/download/{filename}"
+    },
+    "timestamp": "__TS__"
+})
+_root_cache: Tuple[int, bytes] = (-1, b"")
+
+# Snapshot do health check - EDITE AQUI o intervalo de atualização
+HEALTH_REFRESH_SECONDS = 10
+_health_body = b""
+_health_task: Optional[asyncio.Task] = None
+
+
+def _refresh_health_snapshot() -> None:
+    """
+    Recalcula o estado dos diretórios e módulos e serializa o resultado.
+    """
+    global _health_body
+    
+    # Verifica se os diretórios existem
+    directories_status = {}
+    for directory in [UPLOAD_DIR, OUTPUT_DIR, TEMPLATE_DIR, DATA_DIR]:
+        directories_status[directory] = os.path.exists(directory)
+    
+    # Verifica se os módulos estão funcionando
+    modules_status = {
+        "data_loader": data_loader is not None,
+        "analytics_engine": analytics_engine is not None,
+        "pptx_generator": pptx_generator is not None
+    }
+    
+    _health_body = orjson.dumps({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "directories": directories_status,
+        "modules": modules_status,
+        "uptime": "running"
+    })
+
+
+async def _health_ticker() -> None:
+    """Atualiza o snapshot do health check periodicamente."""
+    while True:
+        await asyncio.sleep(HEALTH_REFRESH_SECONDS)
+        try:
+            _refresh_health_snapshot()
+        except Exception as e:
+            logger.error(f"Erro ao atualizar health check: {str(e)}")
+
+
+_refresh_health_snapshot()
+
+
+@app.on_event("startup")
+async def start_health_ticker():
+    """
+    Inicia a atualização periódica do snapshot do health check.
+    """
+    global _health_task
+    _refresh_health_snapshot()
+    _health_task = asyncio.create_task(_health_ticker())
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """
+    Encerra a atualização do health check e o pool de análises.
+    """
+    if _health_task is not None:
+        _health_task.cancel()
+    _analysis_pool.shutdown(wait=False, cancel_futures=True)
+
 
 @app.get("/")
 async def root():
     """
     Endpoint raiz com informações básicas do agente.
     """
-    return {
-        "message": "Analytics Agent - Servidor ativo",
-        "version": "1.0.0",
-        "status": "running",
-        "endpoints": {
-            "docs": "/docs",
-            "health": "/health",
-            "upload": "/upload",
-            "analyze": "/analyze",
-            "generate_pptx": "/generate-pptx",
-            "download": "/download/{filename}"
-        },
-        "timestamp": datetime.now().isoformat()
-    }
+    global _root_cache
+    
+    # Regenera o corpo no máximo uma vez por segundo
+    second = int(time.time())
+    if _root_cache[0] != second:
+        timestamp = datetime.now().isoformat().encode()
+        _root_cache = (second, _ROOT_TEMPLATE.replace(b"__TS__", timestamp))
+    
+    return Response(content=_root_cache[1], media_type="application/json")
 
 
 @app.get("/health")
 async def health_check():
     """
     Endpoint de verificação de saúde do sistema.
+    O estado é amostrado na inicialização e a cada HEALTH_REFRESH_SECONDS.
     """
-    try:
-        # Verifica se os diretórios existem
-        directories_status = {}
-        for directory in [UPLOAD_DIR, OUTPUT_DIR, TEMPLATE_DIR, DATA_DIR]:
-            directories_status[directory] = os.path.exists(directory)
-        
-        # Verifica se os módulos estão funcionando
-        modules_status = {
-            "data_loader": data_loader is not None,
-            "analytics_engine": analytics_engine is not None,
-            "pptx_generator": pptx_generator is not None
-        }
-        
-        return {
-            "status": "healthy",
-            "timestamp": datetime.now().isoformat(),
-            "directories": directories_status,
-            "modules": modules_status,
-            "uptime": "running"
-        }
-    except Exception as e:
-        logger.error(f"Erro no health check: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
+    return Response(content=_health_body, media_type="application/json")
 
 
 @app.post("/upload")
@@ -141,25 +497,22 @@ async def upload_file(file: UploadFile = File(...)):
         logger.info(f"Recebendo upload: {file.filename}")
         
         # Valida tipo de arquivo
-        allowed_extensions = ['.csv', '.xlsx', '.xls']
         file_extension = Path(file.filename).suffix.lower()
         
-        if file_extension not in allowed_extensions:
+        if file_extension not in _LOADERS:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Tipo de arquivo não suportado. Use: {', '.join(allowed_extensions)}"
+                detail=f"Tipo de arquivo não suportado. Use: {', '.join(_LOADERS)}"
             )
         
-        # Salva arquivo
+        # Salva arquivo em blocos sem bloquear o event loop
         file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
         
-        # Carrega dados para validação
-        if file_extension == '.csv':
-            df = data_loader.load_csv(file_path)
-        else:
-            df = data_loader.load_excel(file_path)
+        # Carrega dados para validação (parsing do pandas fora do event loop)
+        df = await asyncio.get_running_loop().run_in_executor(_analysis_pool, _cached_load, file_path)
         
         # Obtém informações do arquivo
         data_info = data_loader.get_data_info(df)
@@ -179,192 +532,180 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Erro no upload: {str(e)}")
 
 
-@app.post("/analyze")
-async def analyze_data(
-    file_path: str = Form(...),
-    analysis_type: str = Form(...),
-    parameters: str = Form(...)
-):
+def _run_analysis(df: pd.DataFrame, analysis: AnalyzeRequest) -> Dict:
     """
-    Endpoint para análise de dados.
+    Executa a análise solicitada sobre um DataFrame já carregado.
     
     Args:
-        file_path: Caminho para o arquivo de dados
-        analysis_type: Tipo de análise (compare_periods, segment_groups, count_reasons, custom_kpis)
-        parameters: Parâmetros da análise em JSON
+        df: Dados carregados
+        analysis: Requisição validada (tipo de análise e parâmetros)
         
     Returns:
         Dict: Resultado da análise
     """
-    try:
-        logger.info(f"Iniciando análise: {analysis_type}")
-        
-        # Valida se arquivo existe
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Arquivo não encontrado")
-        
-        # Carrega dados
-        file_extension = Path(file_path).suffix.lower()
-        if file_extension == '.csv':
-            df = data_loader.load_csv(file_path)
-        else:
-            df = data_loader.load_excel(file_path)
-        
-        # Parse dos parâmetros
-        try:
-            params = json.loads(parameters)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Parâmetros JSON inválidos")
+    params = analysis.parameters
+    
+    if analysis.analysis_type == "compare_periods":
+        return analytics_engine.compare_periods(df, params.period1, params.period2, params.metrics)
         
-        # Executa análise conforme tipo
-        result = None
+    elif analysis.analysis_type == "segment_groups":
+        return analytics_engine.segment_by_groups(df, params.group_columns, params.metrics)
         
-        if analysis_type == "compare_periods":
-            period1 = params.get('period1')
-            period2 = params.get('period2')
-            metrics = params.get('metrics', ['total', 'media', 'crescimento'])
-            
-            if not period1 or not period2:
-                raise HTTPException(status_code=400, detail="Períodos obrigatórios para comparação")
-            
-            result = analytics_engine.compare_periods(df, period1, period2, metrics)
-            
-        elif analysis_type == "segment_groups":
-            group_columns = params.get('group_columns', [])
-            metrics = params.get('metrics', ['total', 'media', 'count'])
-            
-            if not group_columns:
-                raise HTTPException(status_code=400, detail="Colunas de agrupamento obrigatórias")
-            
-            result = analytics_engine.segment_by_groups(df, group_columns, metrics)
-            
-        elif analysis_type == "count_reasons":
-            reason_column = params.get('reason_column')
-            result = analytics_engine.count_contact_reasons(df, reason_column)
-            
-        elif analysis_type == "custom_kpis":
-            kpi_definitions = params.get('kpi_definitions', {})
-            
-            if not kpi_definitions:
-                raise HTTPException(status_code=400, detail="Definições de KPI obrigatórias")
-            
-            result = analytics_engine.calculate_custom_kpis(df, kpi_definitions)
-            
-        else:
-            raise HTTPException(status_code=400, detail=f"Tipo de análise não suportado: {analysis_type}")
+    elif analysis.analysis_type == "count_reasons":
+        return analytics_engine.count_contact_reasons(df, params.reason_column)
         
-        # Valida resultados
-        validation = analytics_engine.validate_results(result)
+    elif analysis.analysis_type == "custom_kpis":
+        return analytics_engine.calculate_custom_kpis(df, params.kpi_definitions)
+    
+    raise HTTPException(status_code=400, detail=f"Tipo de análise não suportado: {analysis.analysis_type}")
+
+
+def _analyze_file(analysis: AnalyzeRequest) -> Dict:
+    """
+    Carrega o arquivo, executa a análise e monta a resposta padrão.
+    Compartilhado por /analyze, /analyze-and-generate e /copilot/analyze.
+    """
+    logger.info(f"Iniciando análise: {analysis.analysis_type}")
+    
+    # Valida se arquivo existe
+    if not os.path.exists(analysis.file_path):
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    
+    # Carrega dados (reaproveita o cache enquanto o arquivo não mudar)
+    df = _cached_load(analysis.file_path)
+    
+    result = _run_analysis(df, analysis)
+    
+    # Valida resultados
+    validation = analytics_engine.validate_results(result)
+    
+    logger.info(f"Análise concluída: {analysis.analysis_type}")
+    
+    return {
+        "message": "Análise concluída com sucesso",
+        "analysis_type": analysis.analysis_type,
+        "result": result,
+        "validation": validation,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+async def _analyze_file_async(analysis: AnalyzeRequest) -> Dict:
+    """
+    Executa _analyze_file no pool de análises sem bloquear o event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_analysis_pool, _analyze_file, analysis)
+
+
+def _run_generate(template_path: str, placeholder_data: Dict[str, Any], output_filename: str) -> Dict:
+    """
+    Gera a apresentação a partir de dados já decodificados.
+    
+    Args:
+        template_path: Caminho para o template PPTX
+        placeholder_data: Valores dos placeholders
+        output_filename: Nome do arquivo de saída
         
-        logger.info(f"Análise concluída: {analysis_type}")
+    Returns:
+        Dict: Informações sobre a apresentação gerada
+    """
+    logger.info(f"Gerando PPTX: {output_filename}")
+    
+    # Valida template
+    if not os.path.exists(template_path):
+        raise HTTPException(status_code=404, detail="Template não encontrado")
+    
+    # Carrega template a partir do cache em memória
+    mtime_ns, template_bytes = _read_template(template_path)
+    if not pptx_generator.load_template_bytes(template_bytes, template_path):
+        raise HTTPException(status_code=500, detail="Erro ao carregar template")
+    
+    # Obtém lista de placeholders (memoizada por template)
+    placeholders = list(_template_placeholders(template_path, mtime_ns) or ())
+    
+    # Substitui placeholders
+    replaced_count = pptx_generator.replace_placeholders(placeholder_data)
+    
+    # Salva apresentação
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    if not pptx_generator.save_presentation(output_path):
+        raise HTTPException(status_code=500, detail="Erro ao salvar apresentação")
+    
+    logger.info(f"PPTX gerado com sucesso: {output_filename}")
+    
+    return {
+        "message": "Apresentação gerada com sucesso",
+        "output_filename": output_filename,
+        "output_path": output_path,
+        "placeholders_found": placeholders,
+        "placeholders_replaced": replaced_count,
+        "download_url": f"/download/{output_filename}",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post("/analyze")
+async def analyze_data(request: AnalyzeRequest):
+    """
+    Endpoint para análise de dados.
+    
+    Args:
+        request: Caminho do arquivo, tipo de análise (compare_periods, segment_groups,
+            count_reasons, custom_kpis) e parâmetros correspondentes
         
-        return {
-            "message": "Análise concluída com sucesso",
-            "analysis_type": analysis_type,
-            "result": result,
-            "validation": validation,
-            "timestamp": datetime.now().isoformat()
-        }
+    Returns:
+        Dict: Resultado da análise
+    """
+    try:
+        return await _analyze_file_async(request)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro na análise: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Erro na análise: {}", str(e))
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
 
 
 @app.post("/generate-pptx")
-async def generate_pptx(
-    template_path: str = Form(...),
-    data: str = Form(...),
-    output_filename: str = Form(...)
-):
+async def generate_pptx(request: GeneratePptxRequest):
     """
     Endpoint para geração de apresentação PPTX.
     
     Args:
-        template_path: Caminho para o template PPTX
-        data: Dados para substituir placeholders (JSON)
-        output_filename: Nome do arquivo de saída
+        request: Caminho do template, dados dos placeholders e nome do arquivo de saída
         
     Returns:
         Dict: Informações sobre a apresentação gerada
     """
     try:
-        logger.info(f"Gerando PPTX: {output_filename}")
-        
-        # Valida template
-        if not os.path.exists(template_path):
-            raise HTTPException(status_code=404, detail="Template não encontrado")
-        
-        # Parse dos dados
-        try:
-            placeholder_data = json.loads(data)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Dados JSON inválidos")
-        
-        # Carrega template
-        if not pptx_generator.load_template(template_path):
-            raise HTTPException(status_code=500, detail="Erro ao carregar template")
-        
-        # Obtém lista de placeholders
-        placeholders = pptx_generator.get_placeholders_list()
-        
-        # Substitui placeholders
-        replaced_count = pptx_generator.replace_placeholders(placeholder_data)
-        
-        # Salva apresentação
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-        if not pptx_generator.save_presentation(output_path):
-            raise HTTPException(status_code=500, detail="Erro ao salvar apresentação")
-        
-        logger.info(f"PPTX gerado com sucesso: {output_filename}")
-        
-        return {
-            "message": "Apresentação gerada com sucesso",
-            "output_filename": output_filename,
-            "output_path": output_path,
-            "placeholders_found": placeholders,
-            "placeholders_replaced": replaced_count,
-            "download_url": f"/download/{output_filename}",
-            "timestamp": datetime.now().isoformat()
-        }
+        return _run_generate(request.template_path, request.data, request.output_filename)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro na geração de PPTX: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Erro na geração de PPTX: {}", str(e))
         raise HTTPException(status_code=500, detail=f"Erro na geração de PPTX: {str(e)}")
 
 
 @app.post("/analyze-and-generate")
-async def analyze_and_generate(
-    file_path: str = Form(...),
-    analysis_type: str = Form(...),
-    analysis_parameters: str = Form(...),
-    template_path: str = Form(...),
-    output_filename: str = Form(...)
-):
+async def analyze_and_generate(request: AnalyzeAndGenerateRequest):
     """
     Endpoint combinado para análise de dados e geração de PPTX.
     
     Args:
-        file_path: Caminho para o arquivo de dados
-        analysis_type: Tipo de análise
-        analysis_parameters: Parâmetros da análise (JSON)
-        template_path: Caminho para o template PPTX
-        output_filename: Nome do arquivo de saída
+        request: Requisição de análise, caminho do template e nome do arquivo de saída
         
     Returns:
         Dict: Resultado da análise e informações da apresentação gerada
     """
+    analysis_type = request.analysis.analysis_type
+    output_filename = request.output_filename
     try:
         logger.info(f"Executando análise e geração combinada: {analysis_type} -> {output_filename}")
         
         # Executa análise
-        analysis_response = await analyze_data(file_path, analysis_type, analysis_parameters)
+        analysis_response = await _analyze_file_async(request.analysis)
         analysis_result = analysis_response["result"]
         
         # Prepara dados para PPTX baseado no tipo de análise
@@ -384,16 +725,16 @@ async def analyze_and_generate(
             }
             
         elif analysis_type == "segment_groups":
-            # Pega o maior segmento
-            segments = analysis_result["segments"]
-            if segments:
-                largest_segment = max(segments.items(), key=lambda x: x[1]["records"])
+            # Pega o maior segmento a partir das colunas paralelas do resultado
+            records = analysis_result["records"]
+            if records:
+                idx = int(np.argmax(records))
                 pptx_data = {
                     "total_segmentos": analysis_result["summary"]["total_segments"],
                     "total_registros": analysis_result["summary"]["total_records"],
-                    "maior_segmento_nome": largest_segment[0],
-                    "maior_segmento_registros": largest_segment[1]["records"],
-                    "maior_segmento_percentual": largest_segment[1]["percentage_of_total"],
+                    "maior_segmento_nome": analysis_result["names"][idx],
+                    "maior_segmento_registros": records[idx],
+                    "maior_segmento_percentual": analysis_result["percentage_of_total"][idx],
                     "data_analise": datetime.now().strftime("%d/%m/%Y")
                 }
         
@@ -408,12 +749,8 @@ async def analyze_and_generate(
                 "data_analise": datetime.now().strftime("%d/%m/%Y")
             }
         
-        # Gera PPTX
-        pptx_response = await generate_pptx(
-            template_path, 
-            json.dumps(pptx_data), 
-            output_filename
-        )
+        # Gera PPTX diretamente com o dicionário, sem serializar para JSON
+        pptx_response = _run_generate(request.template_path, pptx_data, output_filename)
         
         logger.info(f"Análise e geração combinada concluída: {output_filename}")
         
@@ -427,8 +764,7 @@ async def analyze_and_generate(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro na análise e geração combinada: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Erro na análise e geração combinada: {}", str(e))
         raise HTTPException(status_code=500, detail=f"Erro na análise e geração combinada: {str(e)}")
 
 
@@ -446,15 +782,19 @@ async def download_file(filename: str):
     try:
         file_path = os.path.join(OUTPUT_DIR, filename)
         
-        if not os.path.exists(file_path):
+        # Um único stat: reaproveitado pela resposta para Content-Length/ETag
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Arquivo não encontrado")
         
         logger.info(f"Download solicitado: {filename}")
         
-        return FileResponse(
+        return DownloadFileResponse(
             path=file_path,
             filename=filename,
-            media_type='application/octet-stream'
+            media_type='application/octet-stream',
+            stat_result=stat_result
         )
         
     except HTTPException:
@@ -464,6 +804,33 @@ async def download_file(filename: str):
         raise HTTPException(status_code=500, detail=f"Erro no download: {str(e)}")
 
 
+def _scan_directory(directory: str) -> List[Dict[str, Any]]:
+    """
+    Lista os arquivos de um diretório com um único stat por entrada.
+    
+    Args:
+        directory: Diretório a ser listado
+        
+    Returns:
+        List[Dict]: Nome, caminho, tamanho e data de modificação de cada arquivo
+    """
+    entries = []
+    if not os.path.isdir(directory):
+        return entries
+    
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file():
+                stat_result = entry.stat()
+                entries.append({
+                    "name": entry.name,
+                    "path": entry.path,
+                    "size": stat_result.st_size,
+                    "modified": datetime.fromtimestamp(stat_result.st_mtime).isoformat()
+                })
+    return entries
+
+
 @app.get("/list-files")
 async def list_files():
     """
@@ -473,13 +840,6 @@ async def list_files():
         Dict: Lista de arquivos por diretório
     """
     try:
-        files = {
-            "uploads": [],
-            "templates": [],
-            "outputs": [],
-            "data": []
-        }
-        
         # Lista arquivos em cada diretório
         directories = {
             "uploads": UPLOAD_DIR,
@@ -488,18 +848,10 @@ async def list_files():
             "data": DATA_DIR
         }
         
+        # A varredura roda fora do event loop
+        files = {}
         for key, directory in directories.items():
-            if os.path.exists(directory):
-                for filename in os.listdir(directory):
-                    file_path = os.path.join(directory, filename)
-                    if os.path.isfile(file_path):
-                        file_info = {
-                            "name": filename,
-                            "path": file_path,
-                            "size": os.path.getsize(file_path),
-                            "modified": datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
-                        }
-                        files[key].append(file_info)
+            files[key] = await asyncio.to_thread(_scan_directory, directory)
         
         return {
             "message": "Lista de arquivos",
@@ -529,12 +881,11 @@ async def get_template_placeholders(template_name: str):
         if not os.path.exists(template_path):
             raise HTTPException(status_code=404, detail="Template não encontrado")
         
-        # Carrega template e obtém placeholders
-        temp_generator = PPTXGenerator()
-        if not temp_generator.load_template(template_path):
+        # Obtém placeholders (memoizados enquanto o template não mudar)
+        placeholders = _template_placeholders(template_path, os.stat(template_path).st_mtime_ns)
+        if placeholders is None:
             raise HTTPException(status_code=500, detail="Erro ao carregar template")
-        
-        placeholders = temp_generator.get_placeholders_list()
+        placeholders = list(placeholders)
         
         return {
             "message": "Placeholders do template",
@@ -572,30 +923,15 @@ async def copilot_analyze(request: Dict[str, Any]):
         analysis_params = request.get("parameters", {})
         
         # Processa requisição baseada na query
-        # EDITE AQUI para adicionar mais tipos de query do Copilot
-        if "comparar períodos" in query.lower() or "compare periods" in query.lower():
-            # Análise de comparação de períodos
-            result = await analyze_data(
-                data_source,
-                "compare_periods",
-                json.dumps(analysis_params)
-            )
-            
-        elif "segmentar" in query.lower() or "segment" in query.lower():
-            # Análise de segmentação
-            result = await analyze_data(
-                data_source,
-                "segment_groups",
-                json.dumps(analysis_params)
-            )
-            
-        else:
-            # Análise genérica
-            result = await analyze_data(
-                data_source,
-                analysis_params.get("type", "compare_periods"),
-                json.dumps(analysis_params)
-            )
+        # Sem palavra-chave reconhecida, usa o tipo informado nos parâmetros (análise genérica)
+        analysis_type = _route_copilot_query(query) or analysis_params.get("type", "compare_periods")
+        
+        analysis = _analyze_request_adapter.validate_python({
+            "file_path": data_source,
+            "analysis_type": analysis_type,
+            "parameters": analysis_params
+        })
+        result = await _analyze_file_async(analysis)
         
         # Formata resposta para o Copilot
         copilot_response = {
@@ -620,13 +956,52 @@ async def copilot_analyze(request: Dict[str, Any]):
         }
 
 
+# Limita quantas queries de um lote ocupam o pool de análises ao mesmo tempo
+_copilot_batch_semaphore = asyncio.Semaphore(ANALYSIS_WORKERS)
+
+
+async def _copilot_analyze_limited(request: Dict[str, Any]) -> Dict:
+    """Processa uma requisição do lote respeitando o limite de concorrência."""
+    async with _copilot_batch_semaphore:
+        return await copilot_analyze(request)
+
+
+@app.post("/copilot/analyze-batch")
+async def copilot_analyze_batch(requests: List[Dict[str, Any]]):
+    """
+    Executa várias requisições do Copilot em paralelo.
+    
+    Requisições sobre o mesmo arquivo compartilham o DataFrame em cache,
+    que é carregado uma única vez.
+    
+    Args:
+        requests: Lista de requisições no formato de /copilot/analyze
+        
+    Returns:
+        List[Dict]: Respostas na mesma ordem das requisições
+    """
+    logger.info(f"Lote de {len(requests)} requisições recebido do Microsoft Copilot M365")
+    return await asyncio.gather(*(_copilot_analyze_limited(r) for r in requests))
+
 if __name__ == "__main__":
     # Configuração do servidor - EDITE AQUI conforme necessário
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",  # Permite acesso externo
-        port=8000,       # Porta do servidor
-        reload=True,     # Recarrega automaticamente em desenvolvimento
-        log_level="info"
-    )
-
+    if os.getenv("ENV") == "prod":
+        # Produção: um processo por núcleo, event loop uvloop (se disponível) e parser HTTP em C
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WORKERS", os.cpu_count() or 1)),
+            loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
+            http="httptools",
+            access_log=False,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",  # Permite acesso externo
+            port=8000,       # Porta do servidor
+            reload=True,     # Recarrega automaticamente em desenvolvimento
+            log_level="info"
+        )
@@ -5,16 +5,26 @@ Sistema completo de analytics com capacidades de aprendizado contínuo
 
 import os
 import time
-import uuid
+import json
+import hashlib
+import asyncio
+import secrets
+import itertools
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, JSONResponse, Response
+from pydantic import BaseModel, ConfigDict
 import uvicorn
+import aiofiles
+import anyio
+import orjson
+from cachetools import TTLCache
 
 from agents.data_loader import DataLoader
 from agents.analytics_engine import AnalyticsEngine
@@ -24,17 +34,53 @@ from agents.nlp_engine import nlp_engine
 from agents.recommendation_engine import recommendation_engine
 from agents.ml_engine import ml_engine
 from agents.admin_system import admin_system
+from common_routes import (
+    router as common_router, scan_directory, invalidate_listing, NumpyORJSONResponse, ORJSON_OPTIONS
+)
 
 from loguru import logger
 
+# Lock de arquivo para o warmup (fcntl no Linux, msvcrt no Windows)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+try:
+    import msvcrt
+    MSVCRT_AVAILABLE = True
+except ImportError:
+    MSVCRT_AVAILABLE = False
+
+# uvloop não existe no Windows: lá o servidor usa o loop asyncio padrão
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 # Configurar logging
 logger.add("logs/analytics_agent.log", rotation="1 day", retention="30 days")
 
+def _etag_response(request: Request, content: Any) -> Response:
+    """
+    JSON com ETag fraco (hash do conteúdo) e Cache-Control curto para GETs
+    idempotentes; responde 304 se o cliente já tem a mesma versão.
+    """
+    body = orjson.dumps(content, option=ORJSON_OPTIONS)
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=30"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Inicializar FastAPI
 app = FastAPI(
     title="Analytics Agent com IA",
     description="Sistema de analytics com aprendizado contínuo e processamento de linguagem natural",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=NumpyORJSONResponse
 )
 
 # Configurar CORS
@@ -51,14 +97,147 @@ data_loader = DataLoader()
 analytics_engine = AnalyticsEngine()
 pptx_generator = PPTXGenerator()
 
+# Tamanho do bloco de gravação dos uploads (1 MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+DATA_FILE_SUFFIXES = ('.csv', '.xlsx', '.xls')
+
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+# Workers do uvicorn (ver __main__): cpu_count() para cargas CPU-bound
+# (pandas/sklearn/pptx); use 2*cpu_count()+1 se a carga for majoritariamente de I/O
+WORKERS = int(os.getenv("WORKERS", os.cpu_count() or 1))  # EDITE AQUI
+
+# Renderização de PPTX (CPU e GIL) em processos separados; o pool é criado
+# no startup de cada worker e fica em app.state.pptx_pool. Os CPUs são
+# divididos entre os workers para não criar cpu_count² processos
+PPTX_POOL_WORKERS = int(os.getenv("PPTX_POOL_WORKERS", max(1, (os.cpu_count() or 1) // WORKERS)))  # EDITE AQUI
+
+# Fila de registro de interações (gravação no banco fora do caminho da requisição)
+LOG_QUEUE_SIZE = 10_000  # EDITE AQUI
+
+
+# Cache de recomendações por usuário: (tipo, user_id, contexto) -> resultado
+REC_CACHE = TTLCache(maxsize=5000, ttl=60)
+
+# Recomendações de template mudam pouco: cache mais longo (5 min)
+TEMPLATE_REC_CACHE = TTLCache(maxsize=5000, ttl=300)
+
+# Cache de perfis de usuário: user_id -> perfil (invalidado no /feedback)
+PROFILE_CACHE = TTLCache(maxsize=10_000, ttl=600)
+
+
+def _context_key(context: Optional[Dict]) -> Optional[str]:
+    """Representação estável do contexto para compor a chave do cache"""
+    return json.dumps(context, sort_keys=True, default=str) if context else None
+
+
+def _cached_recommendation(kind: str, user_id: str, extra: Any, compute,
+                           cache: TTLCache = REC_CACHE):
+    """Retorna a recomendação em cache ou calcula e armazena até o TTL do cache"""
+    key = (kind, user_id, extra)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache[key] = value
+    return value
+
+
+def _invalidate_user_caches(user_id: Optional[str]):
+    """Descarta recomendações e perfil de um usuário (ou de todos, se desconhecido)"""
+    for cache in (REC_CACHE, TEMPLATE_REC_CACHE):
+        if user_id is None:
+            cache.clear()
+            continue
+        for key in [k for k in list(cache.keys()) if k[1] == user_id]:
+            cache.pop(key, None)
+    if user_id is None:
+        PROFILE_CACHE.clear()
+    else:
+        PROFILE_CACHE.pop(user_id, None)
+
+
+def _recommend_analyses(user_id: str, context: Optional[Dict] = None):
+    return _cached_recommendation(
+        "analyses", user_id, _context_key(context),
+        lambda: recommendation_engine.recommend_analyses(user_id, context)
+    )
+
+
+def _user_profile(user_id: str) -> Dict:
+    """Perfil do usuário em cache por até 10 minutos"""
+    profile = PROFILE_CACHE.get(user_id)
+    if profile is None:
+        profile = recommendation_engine.build_user_profile(user_id)
+        PROFILE_CACHE[user_id] = profile
+    return profile
+
+
+def _recommend_templates(user_id: str, analysis_type: Optional[str] = None):
+    return _cached_recommendation(
+        "templates", user_id, analysis_type,
+        lambda: recommendation_engine.recommend_templates(user_id, analysis_type),
+        cache=TEMPLATE_REC_CACHE
+    )
+
+
+@lru_cache(maxsize=1)
+def _template_names(templates_mtime_ns: int) -> frozenset:
+    """Templates .pptx disponíveis; refeito apenas quando templates/ muda"""
+    return frozenset(p.name for p in Path("templates").glob("*.pptx"))
+
+
+def _template_exists(name: str) -> bool:
+    """Verifica o template com um único stat do diretório"""
+    try:
+        return name in _template_names(os.stat("templates").st_mtime_ns)
+    except FileNotFoundError:
+        return False
+
+
+@lru_cache(maxsize=32)
+def _load_cached(file_path: str, mtime_ns: int, size: int):
+    """DataFrame carregado por (caminho, mtime, tamanho); deve ser tratado como somente leitura"""
+    return data_loader.load_data(file_path)
+
+
+def _load_data(file_path: str):
+    """Carrega o arquivo reaproveitando o parsing enquanto ele não for alterado"""
+    st = os.stat(file_path)
+    return _load_cached(file_path, st.st_mtime_ns, st.st_size)
+
+
+def _run_analysis(df, analysis_type: str, parameters: Dict) -> Dict:
+    """Executa a análise solicitada (chamada fora do event loop)"""
+    if analysis_type == "compare_periods":
+        return analytics_engine.compare_periods(df, parameters)
+    elif analysis_type == "segment_by_groups":
+        return analytics_engine.segment_by_groups(df, parameters)
+    elif analysis_type == "count_contact_reasons":
+        return analytics_engine.count_contact_reasons(df, parameters)
+    elif analysis_type == "calculate_custom_kpis":
+        return analytics_engine.calculate_custom_kpis(df, parameters)
+    raise ValueError(f"Tipo de análise não suportado: {analysis_type}")
+
+
+def _render_presentation(analysis_result: Dict, template_path: str, output_path: str):
+    """Gera a apresentação num processo do pool de PPTX, com a instância local do gerador"""
+    return pptx_generator.generate_presentation(analysis_result, template_path, output_path)
+
 # Modelos Pydantic para IA
+# Requisições imutáveis; campos extras são ignorados
+_REQUEST_CONFIG = ConfigDict(extra="ignore", frozen=True)
+
 class NLPQuery(BaseModel):
+    model_config = _REQUEST_CONFIG
     query: str
     user_id: str = "default"
     context: Optional[Dict] = None
 
 class FeedbackData(BaseModel):
+    model_config = _REQUEST_CONFIG
     interaction_id: str
+    user_id: Optional[str] = None  # Usado para invalidar caches do usuário
     rating: int  # 1-5
     feedback_type: str = "general"
     comment: Optional[str] = None
@@ -66,40 +245,167 @@ class FeedbackData(BaseModel):
     suggestions: Optional[str] = None
 
 class RecommendationRequest(BaseModel):
+    model_config = _REQUEST_CONFIG
     user_id: str
     analysis_type: Optional[str] = None
     context: Optional[Dict] = None
 
 class MLTrainingRequest(BaseModel):
+    model_config = _REQUEST_CONFIG
     model_type: str
     retrain: bool = False
 
 class AdminRequest(BaseModel):
+    model_config = _REQUEST_CONFIG
     user_id: str
     action: str
     parameters: Optional[Dict] = None
 
 class TemplateUpdateRequest(BaseModel):
+    model_config = _REQUEST_CONFIG
     user_id: str
     template_name: str
     new_placeholders: Dict[str, str]
 
 class SharePointConfigRequest(BaseModel):
+    model_config = _REQUEST_CONFIG
     user_id: str
     config: Dict[str, str]
 
+WARMUP_LOCK_PATH = "logs/warmup.lock"
+
+
+def _acquire_warmup_lock(blocking: bool = False):
+    """
+    Trava logs/warmup.lock e retorna o arquivo aberto (liberar com
+    _release_warmup_lock). Sem blocking, retorna None se outro worker
+    já tem o lock; com blocking, espera ele ser liberado.
+    """
+    Path(WARMUP_LOCK_PATH).parent.mkdir(parents=True, exist_ok=True)
+    handle = open(WARMUP_LOCK_PATH, "a+")
+    handle.seek(0)
+    try:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif MSVCRT_AVAILABLE:
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK desiste após ~10s: continua esperando
+                    if not blocking:
+                        raise
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def _release_warmup_lock(handle):
+    """Libera o lock de warmup e fecha o arquivo"""
+    try:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        elif MSVCRT_AVAILABLE:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        handle.close()
+
+
+def _warmup_models():
+    """Treina os modelos ML (executado por um único worker)"""
+    logger.info("Inicializando modelos ML...")
+    # Modelos salvos por um warmup anterior (os train_* não retreinam o que já existe)
+    ml_engine._load_existing_models()
+    ml_engine.train_analysis_predictor()
+    ml_engine.train_quality_classifier()
+    ml_engine.train_anomaly_detector()
+    ml_engine.train_user_clusterer()
+    logger.info("Modelos ML inicializados")
+
+
+async def _drain_interaction_log(queue: asyncio.Queue):
+    """Consumidor único: grava as interações enfileiradas pelo middleware"""
+    while True:
+        interaction_data = await queue.get()
+        try:
+            await anyio.to_thread.run_sync(lambda: feedback_system.log_interaction(**interaction_data))
+        except Exception as e:
+            logger.warning(f"Erro ao registrar interação: {e}")
+        finally:
+            queue.task_done()
+
+@app.on_event("startup")
+async def init_state():
+    """Instâncias compartilhadas criadas uma vez por worker"""
+    app.state.pptx_pool = ProcessPoolExecutor(max_workers=PPTX_POOL_WORKERS)
+    app.state.admin_acl = frozenset(u.lower() for u in admin_system.authorized_users)
+    app.state.log_queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+    app.state.log_task = asyncio.create_task(_drain_interaction_log(app.state.log_queue))
+
+async def _reload_after_warmup():
+    """Espera o worker do warmup liberar o lock e recarrega os modelos que ele salvou"""
+    handle = await anyio.to_thread.run_sync(_acquire_warmup_lock, True)
+    if handle is not None:
+        _release_warmup_lock(handle)
+    try:
+        await anyio.to_thread.run_sync(ml_engine._load_existing_models)
+        logger.info("Modelos ML recarregados após o warmup")
+    except Exception as e:
+        logger.warning(f"Erro ao recarregar modelos ML: {e}")
+
+@app.on_event("startup")
+async def warmup_models():
+    """
+    Warmup dos modelos ML: um worker treina e salva em disco enquanto segura
+    o lock; os demais esperam o lock em segundo plano e recarregam os modelos.
+    """
+    handle = _acquire_warmup_lock()
+    if handle is None:
+        logger.info("Warmup dos modelos ML em execução por outro worker")
+        app.state.warmup_reload_task = asyncio.create_task(_reload_after_warmup())
+        return
+    try:
+        await anyio.to_thread.run_sync(_warmup_models)
+    except Exception as e:
+        logger.warning(f"Erro na inicialização dos modelos ML: {e}")
+    finally:
+        _release_warmup_lock(handle)
+
+@app.on_event("shutdown")
+async def flush_interaction_log():
+    """Grava as interações pendentes antes de encerrar o consumidor"""
+    await app.state.log_queue.join()
+    app.state.log_task.cancel()
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    """Encerra o pool de renderização de PPTX"""
+    app.state.pptx_pool.shutdown(wait=False, cancel_futures=True)
+
+# IDs de sessão: prefixo aleatório por worker (inclui o pid) + contador
+_SESSION_PREFIX = f"{secrets.token_hex(4)}{os.getpid():x}-"
+_SESSION_COUNTER = itertools.count()
+
+
+def _new_session_id() -> str:
+    """ID de sessão único por worker, sem syscall de aleatoriedade por requisição"""
+    return f"{_SESSION_PREFIX}{next(_SESSION_COUNTER):x}"
+
 # Middleware para logging de interações
 @app.middleware("http")
 async def log_interactions(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Gerar ID da sessão se não existir
-    session_id = request.headers.get("X-Session-ID", str(uuid.uuid4()))
+    session_id = request.headers.get("X-Session-ID") or _new_session_id()
     user_id = request.headers.get("X-User-ID", "anonymous")
     
     response = await call_next(request)
     
-    execution_time = time.time() - start_time
+    execution_time = time.perf_counter() - start_time
     
     # Log da interação (em background para não afetar performance)
     if hasattr(request.state, "interaction_data"):
@@ -111,91 +417,77 @@ async def log_interactions(request: Request, call_next):
             "session_id": session_id
         })
         
-        # Registrar no sistema de feedback
+        # Enfileirar para o consumidor em background (sem bloquear a resposta)
         try:
-            feedback_system.log_interaction(**interaction_data)
-        except Exception as e:
-            logger.warning(f"Erro ao registrar interação: {e}")
+            request.app.state.log_queue.put_nowait(interaction_data)
+        except asyncio.QueueFull:
+            logger.warning("Fila de interações cheia - registro descartado")
     
     return response
 
 # Endpoints originais mantidos
-@app.get("/")
-async def root():
-    """Endpoint raiz com informações do sistema"""
-    return {
-        "message": "Analytics Agent com IA - Sistema de análise de dados com aprendizado contínuo",
-        "version": "2.0.0",
-        "features": [
-            "Análise de dados avançada",
-            "Geração automática de apresentações",
-            "Processamento de linguagem natural",
-            "Sistema de recomendações",
-            "Aprendizado contínuo com ML",
-            "Feedback e personalização"
-        ],
-        "endpoints": {
-            "health": "/health",
-            "docs": "/docs",
-            "upload": "/upload-file",
-            "analyze": "/analyze",
-            "generate_pptx": "/generate-pptx",
-            "nlp_query": "/nlp/query",
-            "recommendations": "/recommendations",
-            "feedback": "/feedback",
-            "ml_status": "/ml/status"
-        }
+# /, /health e /list-files vêm de common_routes; aqui apenas o conteúdo de cada um
+app.state.root_payload = {
+    "message": "Analytics Agent com IA - Sistema de análise de dados com aprendizado contínuo",
+    "version": "2.0.0",
+    "features": [
+        "Análise de dados avançada",
+        "Geração automática de apresentações",
+        "Processamento de linguagem natural",
+        "Sistema de recomendações",
+        "Aprendizado contínuo com ML",
+        "Feedback e personalização"
+    ],
+    "endpoints": {
+        "health": "/health",
+        "docs": "/docs",
+        "upload": "/upload-file",
+        "analyze": "/analyze",
+        "generate_pptx": "/generate-pptx",
+        "nlp_query": "/nlp/query",
+        "recommendations": "/recommendations",
+        "feedback": "/feedback",
+        "ml_status": "/ml/status"
     }
-
-@app.get("/health")
-async def health_check():
-    """Verificação de saúde do sistema"""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {
-            "data_loader": "active",
-            "analytics_engine": "active", 
-            "pptx_generator": "active",
-            "feedback_system": "active",
-            "nlp_engine": "active",
-            "recommendation_engine": "active",
-            "ml_engine": "active"
-        }
+}
+
+app.state.health_payload = {
+    "services": {
+        "data_loader": "active",
+        "analytics_engine": "active", 
+        "pptx_generator": "active",
+        "feedback_system": "active",
+        "nlp_engine": "active",
+        "recommendation_engine": "active",
+        "ml_engine": "active"
     }
+}
 
-@app.get("/list-files")
-async def list_files():
-    """Lista arquivos disponíveis para análise"""
-    data_dir = Path("data")
-    if not data_dir.exists():
-        return {"files": []}
-    
-    files = []
-    for file_path in data_dir.glob("*"):
-        if file_path.is_file() and file_path.suffix in ['.csv', '.xlsx', '.xls']:
-            files.append({
-                "name": file_path.name,
-                "size": file_path.stat().st_size,
-                "modified": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-            })
-    
-    return {"files": files}
+
+def _list_data_files() -> Dict:
+    """Resposta de /list-files: arquivos de dados em data/"""
+    return {"files": scan_directory("data", DATA_FILE_SUFFIXES)}
+
+app.state.list_files = _list_data_files
+app.include_router(common_router)
 
 @app.post("/upload-file")
 async def upload_file(request: Request, file: UploadFile = File(...)):
     """Upload de arquivo para análise"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
-        # Salvar arquivo
+        # Salvar arquivo em blocos (memória limitada a um bloco, sem bloquear o event loop)
         file_path = f"data/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        total_size = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
+                total_size += len(chunk)
+        invalidate_listing("data")
         
         # Carregar e validar dados
-        df = data_loader.load_data(file_path)
+        df = await anyio.to_thread.run_sync(_load_data, file_path)
         validation = data_loader.validate_data(df)
         
         result = {
@@ -210,11 +502,11 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
         request.state.interaction_data = {
             "action_type": "upload",
             "endpoint": "/upload-file",
-            "request_data": {"filename": file.filename, "size": len(content)},
+            "request_data": {"filename": file.filename, "size": total_size},
             "response_data": result
         }
         
-        return result
+        return NumpyORJSONResponse(result)
         
     except Exception as e:
         logger.error(f"Erro no upload: {e}")
@@ -229,11 +521,11 @@ async def analyze_data(
     user_id: str = Query("default", description="ID do usuário")
 ):
     """Análise de dados com IA integrada"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         # Carregar dados
-        df = data_loader.load_data(file_path)
+        df = await anyio.to_thread.run_sync(_load_data, file_path)
         
         # Preparar contexto para IA
         context = {
@@ -243,45 +535,31 @@ async def analyze_data(
             "file_path": file_path
         }
         
-        # Predizer qualidade esperada (se modelo estiver treinado)
-        quality_prediction = ml_engine.predict_quality({
-            "request_data": {"analysis_type": analysis_type, "parameters": parameters},
-            "execution_time": 0,  # Será atualizado depois
-            "success": True
-        })
-        
-        # Executar análise
-        if analysis_type == "compare_periods":
-            result = analytics_engine.compare_periods(df, parameters or {})
-        elif analysis_type == "segment_by_groups":
-            result = analytics_engine.segment_by_groups(df, parameters or {})
-        elif analysis_type == "count_contact_reasons":
-            result = analytics_engine.count_contact_reasons(df, parameters or {})
-        elif analysis_type == "calculate_custom_kpis":
-            result = analytics_engine.calculate_custom_kpis(df, parameters or {})
-        else:
-            raise ValueError(f"Tipo de análise não suportado: {analysis_type}")
-        
-        # Adicionar informações de IA
-        result["ai_insights"] = {
-            "quality_prediction": quality_prediction,
-            "context": context
-        }
+        # Executar análise em thread para não bloquear o event loop
+        result = await anyio.to_thread.run_sync(_run_analysis, df, analysis_type, parameters or {})
         
-        # Detectar anomalias na interação
+        # Qualidade e anomalia numa única passada, com o tempo real de execução
         interaction_data = {
             "request_data": {"analysis_type": analysis_type, "parameters": parameters},
             "response_data": result,
-            "execution_time": time.time() - start_time,
+            "execution_time": time.perf_counter() - start_time,
+            "success": True,
             "user_id": user_id
         }
+        ml_insights = ml_engine.predict_and_detect(interaction_data)
         
-        anomaly_detection = ml_engine.detect_anomaly(interaction_data)
+        # Adicionar informações de IA
+        result["ai_insights"] = {
+            "quality_prediction": ml_insights["quality"],
+            "context": context
+        }
+        
+        anomaly_detection = ml_insights["anomaly"]
         if anomaly_detection.get("is_anomaly"):
             result["ai_insights"]["anomaly_detected"] = anomaly_detection
         
         # Gerar recomendações
-        recommendations = recommendation_engine.recommend_analyses(user_id, context)
+        recommendations = _recommend_analyses(user_id, context)
         result["ai_insights"]["recommendations"] = recommendations[:3]
         
         # Registrar interação
@@ -292,7 +570,7 @@ async def analyze_data(
             "response_data": result
         }
         
-        return result
+        return NumpyORJSONResponse(result)
         
     except Exception as e:
         logger.error(f"Erro na análise: {e}")
@@ -307,12 +585,12 @@ async def generate_pptx(
     user_id: str = Query("default", description="ID do usuário")
 ):
     """Geração de PPTX com recomendações de template"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         # Recomendar template baseado no usuário e tipo de análise
         analysis_type = analysis_result.get("analysis_type", "general")
-        template_recommendations = recommendation_engine.recommend_templates(user_id, analysis_type)
+        template_recommendations = _recommend_templates(user_id, analysis_type)
         
         # Usar template recomendado se disponível
         if template_recommendations:
@@ -320,7 +598,7 @@ async def generate_pptx(
             template_path = f"templates/{recommended_template}"
             
             # Verificar se template existe
-            if not Path(template_path).exists():
+            if not _template_exists(recommended_template):
                 template_path = "templates/template_relatorio.pptx"
         
         # Gerar nome do arquivo se não fornecido
@@ -330,8 +608,10 @@ async def generate_pptx(
         
         output_path = f"output/{output_filename}"
         
-        # Gerar apresentação
-        pptx_generator.generate_presentation(analysis_result, template_path, output_path)
+        # Gerar apresentação no pool de processos
+        await asyncio.get_running_loop().run_in_executor(
+            request.app.state.pptx_pool, _render_presentation, analysis_result, template_path, output_path
+        )
         
         result = {
             "message": "Apresentação gerada com sucesso",
@@ -405,21 +685,21 @@ async def execute_nlp_analysis(query_data: NLPQuery):
             "next_steps": "Use os parâmetros interpretados para executar a análise"
         }
         
-        return result
+        return NumpyORJSONResponse(result)
         
     except Exception as e:
         logger.error(f"Erro na execução NLP: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/recommendations/{user_id}")
-async def get_recommendations(user_id: str, analysis_type: Optional[str] = None):
+async def get_recommendations(request: Request, user_id: str, analysis_type: Optional[str] = None):
     """Obtém recomendações personalizadas para o usuário"""
     try:
         # Obter recomendações de análises
-        analysis_recs = recommendation_engine.recommend_analyses(user_id)
+        analysis_recs = _recommend_analyses(user_id)
         
         # Obter recomendações de templates
-        template_recs = recommendation_engine.recommend_templates(user_id, analysis_type)
+        template_recs = _recommend_templates(user_id, analysis_type)
         
         # Obter alertas proativos
         alerts = recommendation_engine.generate_proactive_alerts(user_id)
@@ -435,7 +715,7 @@ async def get_recommendations(user_id: str, analysis_type: Optional[str] = None)
             "personalization_settings": personalization
         }
         
-        return result
+        return _etag_response(request, result)
         
     except Exception as e:
         logger.error(f"Erro ao obter recomendações: {e}")
@@ -454,6 +734,9 @@ async def submit_feedback(feedback_data: FeedbackData):
             suggestions=feedback_data.suggestions
         )
         
+        # Feedback altera preferências: recomendações e perfil em cache ficam obsoletos
+        _invalidate_user_caches(feedback_data.user_id)
+        
         return {
             "message": "Feedback coletado com sucesso",
             "feedback_id": feedback_id
@@ -464,22 +747,22 @@ async def submit_feedback(feedback_data: FeedbackData):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/feedback/analytics")
-async def get_feedback_analytics(days: int = Query(30, description="Número de dias para análise")):
+async def get_feedback_analytics(request: Request, days: int = Query(30, description="Número de dias para análise")):
     """Obtém analytics de feedback"""
     try:
         analytics = feedback_system.get_feedback_analytics(days)
-        return analytics
+        return _etag_response(request, analytics)
         
     except Exception as e:
         logger.error(f"Erro ao obter analytics de feedback: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/ml/status")
-async def get_ml_status():
+async def get_ml_status(request: Request):
     """Obtém status dos modelos de ML"""
     try:
         status = ml_engine.get_model_status()
-        return status
+        return _etag_response(request, status)
         
     except Exception as e:
         logger.error(f"Erro ao obter status ML: {e}")
@@ -518,11 +801,11 @@ async def train_ml_model(training_request: MLTrainingRequest, background_tasks:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/user/{user_id}/profile")
-async def get_user_profile(user_id: str):
+async def get_user_profile(request: Request, user_id: str):
     """Obtém perfil do usuário"""
     try:
-        profile = recommendation_engine.build_user_profile(user_id)
-        return profile
+        profile = _user_profile(user_id)
+        return _etag_response(request, profile)
         
     except Exception as e:
         logger.error(f"Erro ao obter perfil do usuário: {e}")
@@ -540,17 +823,27 @@ async def get_user_patterns(user_id: str, limit: int = Query(10, description="N
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/download/{filename}")
-async def download_file(filename: str):
+async def download_file(request: Request, filename: str):
     """Download de arquivos gerados"""
     file_path = Path("output") / filename
     
-    if not file_path.exists():
+    # Um único stat: reaproveitado para Content-Length e ETag
+    try:
+        st = file_path.stat()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers = {"Cache-Control": "public, max-age=300", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
     return FileResponse(
         path=file_path,
         filename=filename,
-        media_type='application/octet-stream'
+        media_type=PPTX_MIME if file_path.suffix == ".pptx" else "application/octet-stream",
+        stat_result=st,
+        headers=headers
     )
 
 # ENDPOINTS DE ADMINISTRAÇÃO - REDECORP\R337786
@@ -568,10 +861,10 @@ async def get_admin_dashboard(user_id: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/admin/templates/{user_id}")
-async def list_admin_templates(user_id: str):
+async def list_admin_templates(request: Request, user_id: str):
     """Lista templates para administração"""
     try:
-        if not admin_system.verify_admin_access(user_id):
+        if user_id.lower() not in request.app.state.admin_acl:
             raise HTTPException(status_code=403, detail="Acesso negado")
         
         templates = admin_system.list_templates()
@@ -656,6 +949,10 @@ async def cleanup_old_data(days: int = Query(90, description="Dias para manter o
         # Limpar modelos antigos
         ml_engine.cleanup_old_models(days)
         
+        # Descartar DataFrames em cache
+        _load_cached.cache_clear()
+        ml_engine.clear_prediction_cache()
+        
         return {"message": f"Limpeza concluída - dados anteriores a {days} dias removidos"}
         
     except Exception as e:
@@ -684,7 +981,7 @@ async def chat_with_agent(
             natural_response = nlp_result.get("response", "Como posso ajudá-lo com suas análises?")
         
         # Obter recomendações contextuais
-        recommendations = recommendation_engine.recommend_analyses(user_id, context)
+        recommendations = _recommend_analyses(user_id, context)
         
         result = {
             "response": natural_response,
@@ -693,7 +990,7 @@ async def chat_with_agent(
             "can_execute": nlp_result.get("intent") != "unknown"
         }
         
-        return result
+        return NumpyORJSONResponse(result)
         
     except Exception as e:
         logger.error(f"Erro no chat: {e}")
@@ -704,16 +1001,7 @@ if __name__ == "__main__":
     for directory in ["data", "output", "logs", "data/models"]:
         Path(directory).mkdir(parents=True, exist_ok=True)
     
-    # Inicializar modelos ML em background
-    try:
-        logger.info("Inicializando modelos ML...")
-        ml_engine.train_analysis_predictor()
-        ml_engine.train_quality_classifier()
-        ml_engine.train_anomaly_detector()
-        ml_engine.train_user_clusterer()
-        logger.info("Modelos ML inicializados")
-    except Exception as e:
-        logger.warning(f"Erro na inicialização dos modelos ML: {e}")
+    # Modelos ML são inicializados no evento de startup (um único worker treina)
     
     # Iniciar servidor
     # CONFIGURAÇÃO PARA SERVIDOR LOCAL DA EMPRESA
@@ -723,6 +1011,10 @@ if __name__ == "__main__":
         host="0.0.0.0",        # Permite acesso via localhost e IP específico
         port=5000,             # Porta do servidor
         reload=False,          # Desabilitado para produção
+        workers=WORKERS,       # Ver WORKERS no início do arquivo
+        loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
+        http="httptools",      # Parser HTTP em C
+        access_log=False,      # Interações já registradas pelo middleware
         log_level="info"
     )
 
@@ -14,20 +14,38 @@ Versão simplificada que funciona apenas com dependências básicas:
 
 import os
 import sys
+import shutil
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Any
 import json
+import hashlib
+import tempfile
+import warnings
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # FastAPI e dependências web
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
+from common_routes import router as common_router, scan_directory, NumpyORJSONResponse
+
+# Arrow: Parquet para o cache de DataFrames carregados e value_counts de texto (opcional)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Logging
 try:
     from loguru import logger
@@ -71,7 +89,8 @@ app = FastAPI(
     description="Cognitive Operations & Real-Time EXpert Business Intelligence",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=NumpyORJSONResponse
 )
 
 # Configurar CORS
@@ -103,70 +122,239 @@ pptx_generator = PPTXGenerator() if PPTX_GENERATOR_OK else None
 # ENDPOINTS BÁSICOS
 # ==========================================
 
-@app.get("/")
-async def root():
-    """Endpoint raiz com informações do sistema"""
-    return {
-        "sistema": "CÓRTEX BI v2.0",
-        "descricao": "Cognitive Operations & Real-Time EXpert Business Intelligence",
-        "versao": "2.0.0",
-        "status": "operacional",
-        "timestamp": datetime.now().isoformat(),
-        "componentes": {
-            "data_loader": DATA_LOADER_OK,
-            "analytics_engine": ANALYTICS_ENGINE_OK,
-            "pptx_generator": PPTX_GENERATOR_OK
-        },
-        "endpoints": {
-            "documentacao": "/docs",
-            "health_check": "/health",
-            "listar_arquivos": "/list-files",
-            "admin_dashboard": "/admin/admin_dashboard.html"
-        }
+# /, /health e /list-files vêm de common_routes; aqui apenas o conteúdo de cada um
+_COMPONENTES = {
+    "data_loader": DATA_LOADER_OK,
+    "analytics_engine": ANALYTICS_ENGINE_OK,
+    "pptx_generator": PPTX_GENERATOR_OK
+}
+
+app.state.root_payload = {
+    "sistema": "CÓRTEX BI v2.0",
+    "descricao": "Cognitive Operations & Real-Time EXpert Business Intelligence",
+    "versao": "2.0.0",
+    "status": "operacional",
+    "componentes": _COMPONENTES,
+    "endpoints": {
+        "documentacao": "/docs",
+        "health_check": "/health",
+        "listar_arquivos": "/list-files",
+        "admin_dashboard": "/admin/admin_dashboard.html"
     }
+}
+
+app.state.health_payload = {
+    "sistema": "CÓRTEX BI v2.0",
+    "componentes_ativos": _COMPONENTES
+}
 
-@app.get("/health")
-async def health_check():
-    """Health check do sistema"""
+
+def _list_files() -> Dict:
+    """Resposta de /list-files: dados em data/ e templates PPTX"""
+    data_files = scan_directory("data", (".csv", ".xlsx"))
     return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "sistema": "CÓRTEX BI v2.0",
-        "componentes_ativos": {
-            "data_loader": DATA_LOADER_OK,
-            "analytics_engine": ANALYTICS_ENGINE_OK,
-            "pptx_generator": PPTX_GENERATOR_OK
-        }
+        "csv_files": [f["name"] for f in data_files if f["name"].endswith(".csv")],
+        "excel_files": [f["name"] for f in data_files if f["name"].endswith(".xlsx")],
+        "pptx_templates": [f["name"] for f in scan_directory("templates", (".pptx",))]
     }
 
-@app.get("/list-files")
-async def list_files():
-    """Lista arquivos disponíveis para análise"""
-    files = {
-        "csv_files": [],
-        "excel_files": [],
-        "pptx_templates": []
+app.state.list_files = _list_files
+app.include_router(common_router)
+
+# ==========================================
+# ENDPOINTS DE ANÁLISE BÁSICA
+# ==========================================
+
+# Estatísticas na mesma ordem de df.describe()
+_DESCRIBE_STATS = ("count", "mean", "std", "min", "25%", "50%", "75%", "max")
+
+# describe paralelo por blocos de colunas (só compensa em frames largos)
+DESCRIBE_WORKERS = os.cpu_count() or 1
+DESCRIBE_PARALLEL_MIN_COLUMNS = 64  # EDITE AQUI
+_describe_pool = ThreadPoolExecutor(max_workers=DESCRIBE_WORKERS)
+
+def _describe_block(values: np.ndarray) -> np.ndarray:
+    """Estatísticas de _DESCRIBE_STATS (linhas) para cada coluna do bloco 2-D"""
+    if values.shape[0] == 0:
+        # Sem linhas nanpercentile não devolve uma linha por quantil; describe dá count 0 e NaN
+        stats = np.full((len(_DESCRIBE_STATS), values.shape[1]), np.nan)
+        stats[0] = 0
+        return stats
+    with warnings.catch_warnings():
+        # Colunas vazias/constantes geram NaN, como no describe
+        warnings.simplefilter("ignore", RuntimeWarning)
+        q25, q50, q75 = np.nanpercentile(values, [25, 50, 75], axis=0)
+        return np.vstack([
+            (~np.isnan(values)).sum(axis=0),
+            np.nanmean(values, axis=0),
+            np.nanstd(values, axis=0, ddof=1),
+            np.nanmin(values, axis=0),
+            q25, q50, q75,
+            np.nanmax(values, axis=0)
+        ])
+
+def _describe_categorical(df: pd.DataFrame) -> Optional[Dict]:
+    """
+    Equivalente ao describe() de colunas texto/bool (count, unique, top, freq)
+    com pyarrow.compute.value_counts em vez do value_counts do pandas.
+    Retorna None se alguma coluna não puder ser convertida para Arrow
+    (ex.: object com tipos misturados), para usar o describe do pandas.
+    """
+    summary = {}
+    for col, series in df.items():
+        try:
+            values = pc.drop_null(pa.array(series, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return None
+        
+        counts = pc.value_counts(values)
+        if len(counts) == 0:
+            summary[col] = {"count": 0, "unique": 0, "top": np.nan, "freq": np.nan}
+            continue
+        
+        # Primeiro valor com a maior contagem (value_counts preserva a ordem de aparição)
+        freqs = counts.field("counts")
+        top_idx = pc.index(freqs, pc.max(freqs)).as_py()
+        summary[col] = {
+            "count": len(values),
+            "unique": len(counts),
+            "top": counts.field("values")[top_idx].as_py(),
+            "freq": freqs[top_idx].as_py()
+        }
+    return summary
+
+def _describe(df: pd.DataFrame) -> Dict:
+    """
+    Equivalente a df.describe().to_dict(): as colunas numéricas são resumidas
+    com reduções NumPy sobre o bloco 2-D (uma passada por estatística) em vez
+    de uma Series por coluna; datetime continua com o describe do pandas.
+    """
+    numeric = df.select_dtypes(include=np.number)
+    if numeric.shape[1] == 0:
+        # Só texto/bool: count/unique/top/freq pelo kernel do Arrow
+        categorical = df.select_dtypes(include=["object", "string", "bool"])
+        if PYARROW_AVAILABLE and 0 < categorical.shape[1] == df.shape[1]:
+            summary = _describe_categorical(categorical)
+            if summary is not None:
+                return summary
+        return df.describe().to_dict()
+    
+    values = numeric.to_numpy(dtype=float, na_value=np.nan)
+    if values.shape[1] >= DESCRIBE_PARALLEL_MIN_COLUMNS:
+        # Frames largos: blocos de colunas em threads (NumPy libera o GIL)
+        blocks = np.array_split(values, min(DESCRIBE_WORKERS, values.shape[1]), axis=1)
+        stats = np.hstack(list(_describe_pool.map(_describe_block, blocks)))
+    else:
+        stats = _describe_block(values)
+    
+    summary = {
+        col: dict(zip(_DESCRIBE_STATS, stats[:, i].tolist()))
+        for i, col in enumerate(numeric.columns)
     }
     
-    # Listar arquivos CSV
-    data_dir = Path("data")
-    if data_dir.exists():
-        files["csv_files"] = [f.name for f in data_dir.glob("*.csv")]
-        files["excel_files"] = [f.name for f in data_dir.glob("*.xlsx")]
+    datetimes = df.select_dtypes(include=["datetime", "datetimetz"])
+    if datetimes.shape[1]:
+        # Junto com colunas numéricas o describe inclui std (NaN) para datetime
+        for col, desc in datetimes.describe().to_dict().items():
+            summary[col] = {stat: desc.get(stat, np.nan) for stat in _DESCRIBE_STATS}
+        summary = {col: summary[col] for col in df.columns if col in summary}
+    
+    return summary
+
+# dtype -> nome ("int64", "float64", ...), formatado uma vez por dtype
+_DTYPE_STR: Dict[Any, str] = {}
+
+def _dtype_str(dtype) -> str:
+    """Nome serializável do dtype (os objetos dtype não são JSON)"""
+    name = _DTYPE_STR.get(dtype)
+    if name is None:
+        name = _DTYPE_STR.setdefault(dtype, str(dtype))
+    return name
+
+def _null_counts(df: pd.DataFrame) -> Dict[str, int]:
+    """
+    Equivalente a df.isnull().sum().to_dict(), coluna a coluna: a máscara
+    booleana temporária tem o tamanho de uma coluna, não do DataFrame inteiro.
+    """
+    return {col: int(series.isna().sum()) for col, series in df.items()}
+
+# Cópias Parquet dos arquivos já carregados, compartilhadas entre processos
+FRAME_CACHE_DIR = "output/_cache"  # EDITE AQUI
+
+def _load_frame(file_path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """
+    Carrega data/<file_path>. Na primeira leitura grava um sidecar Parquet
+    (zstd) em FRAME_CACHE_DIR; as seguintes leem o sidecar com memory_map,
+    sem refazer o parse do CSV/XLSX. O nome inclui mtime e tamanho, então
+    um arquivo alterado gera um novo sidecar (o antigo é removido).
+    """
+    prefix = hashlib.sha1(file_path.encode()).hexdigest()[:16]
+    sidecar = os.path.join(FRAME_CACHE_DIR, f"{prefix}-{mtime_ns:x}-{size:x}.parquet")
+    
+    if PYARROW_AVAILABLE and os.path.exists(sidecar):
+        table = pq.read_table(sidecar, memory_map=True)
+        # Parquet não guarda datetime64[s]: restaura a unidade original (metadados do pandas)
+        units = {
+            col['name']: col['numpy_type']
+            for col in (table.schema.pandas_metadata or {}).get('columns', [])
+            if col['pandas_type'] == 'datetime'
+        }
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        for col, dtype in units.items():
+            if col in df.columns and str(df[col].dtype) != dtype:
+                df[col] = df[col].astype(dtype)
+        # Metadados do DataLoader não são persistidos no parquet
+        df.attrs['loaded_at'] = datetime.fromtimestamp(os.stat(sidecar).st_mtime)
+        df.attrs['source'] = 'DataLoader'
+        return df
+    
+    if file_path.endswith('.csv'):
+        df = data_loader.load_csv(f"data/{file_path}")
+    else:
+        df = data_loader.load_excel(f"data/{file_path}")
     
-    # Listar templates PPTX
-    templates_dir = Path("templates")
-    if templates_dir.exists():
-        files["pptx_templates"] = [f.name for f in templates_dir.glob("*.pptx")]
+    if PYARROW_AVAILABLE:
+        # Grava em arquivo temporário e renomeia: leitores nunca veem um Parquet parcial
+        # (mkstemp dá um nome único por processo e por thread)
+        tmp_path = None
+        try:
+            os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=FRAME_CACHE_DIR, suffix=".tmp")
+            os.close(fd)
+            for old in Path(FRAME_CACHE_DIR).glob(f"{prefix}-*.parquet"):
+                old.unlink(missing_ok=True)
+            # Cópia rasa sem attrs: loaded_at (datetime) não é serializável nos metadados
+            sidecar_df = df.copy(deep=False)
+            sidecar_df.attrs = {}
+            sidecar_df.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+            os.replace(tmp_path, sidecar)
+        except Exception as e:
+            # Colunas que o Parquet não representa (ex.: object misto): segue sem cache
+            logger.warning(f"Cache Parquet não gravado para {file_path}: {e}")
+            if tmp_path:
+                Path(tmp_path).unlink(missing_ok=True)
     
-    return files
+    return df
 
-# ==========================================
-# ENDPOINTS DE ANÁLISE BÁSICA
-# ==========================================
+@lru_cache(maxsize=64)
+def _compute_basic(file_path: str, mtime_ns: int, size: int) -> Dict:
+    """Análise básica de data/<file_path>; mtime_ns e size fazem parte da chave do cache"""
+    # Carregar dados
+    df = _load_frame(file_path, mtime_ns, size)
+    
+    # Análise básica
+    return {
+        "arquivo": file_path,
+        "linhas": len(df),
+        "colunas": len(df.columns),
+        "colunas_nomes": df.columns.tolist(),
+        "tipos_dados": {col: _dtype_str(dtype) for col, dtype in df.dtypes.items()},
+        "resumo_estatistico": _describe(df),
+        "valores_nulos": _null_counts(df)
+    }
 
 @app.post("/analyze/basic")
-async def analyze_basic(
+def analyze_basic(
     file_path: str = Form(...),
     analysis_type: str = Form(default="summary")
 ):
@@ -178,38 +366,56 @@ async def analyze_basic(
         )
     
     try:
-        # Carregar dados
-        if file_path.endswith('.csv'):
-            df = data_loader.load_csv(f"data/{file_path}")
-        elif file_path.endswith('.xlsx'):
-            df = data_loader.load_excel(f"data/{file_path}")
-        else:
+        if not file_path.endswith(('.csv', '.xlsx')):
             raise HTTPException(status_code=400, detail="Formato de arquivo não suportado")
         
-        # Análise básica
-        result = {
-            "arquivo": file_path,
-            "linhas": len(df),
-            "colunas": len(df.columns),
-            "colunas_nomes": df.columns.tolist(),
-            "tipos_dados": df.dtypes.to_dict(),
-            "resumo_estatistico": df.describe().to_dict(),
-            "valores_nulos": df.isnull().sum().to_dict(),
-            "timestamp": datetime.now().isoformat()
-        }
+        # Resultado em cache enquanto o arquivo não mudar (mtime/tamanho)
+        st = os.stat(f"data/{file_path}")
+        result = _compute_basic(file_path, st.st_mtime_ns, st.st_size)
         
-        return result
+        # Resposta direta: floats/escalares numpy vão ao orjson sem jsonable_encoder
+        return NumpyORJSONResponse({**result, "timestamp": datetime.now().isoformat()})
         
     except Exception as e:
         logger.error(f"Erro na análise básica: {e}")
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
 
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def _build_basic_presentation(analysis_data: Dict, output) -> None:
+    """
+    Monta a apresentação básica (slide de título) e salva em output,
+    que pode ser um caminho ou um buffer em memória.
+    Usa um gerador próprio por chamada: o handler roda no threadpool.
+    """
+    generator = PPTXGenerator()
+    if not generator.create_new_presentation():
+        raise RuntimeError("Erro ao criar apresentação")
+    
+    slide = generator.presentation.slides[generator.add_slide()]
+    slide.shapes.title.text = analysis_data["title"]
+    if len(slide.placeholders) > 1:
+        slide.placeholders[1].text = (
+            f"{analysis_data['summary']}\n"
+            f"{analysis_data['generated_by']} - {analysis_data['timestamp']}"
+        )
+    
+    if not generator.save_presentation(output):
+        raise RuntimeError("Erro ao salvar apresentação")
+
+
 @app.post("/generate/pptx-basic")
-async def generate_pptx_basic(
+def generate_pptx_basic(
     title: str = Form(...),
-    data_summary: str = Form(...)
+    data_summary: str = Form(...),
+    inline: bool = False
 ):
-    """Gera PPTX básico com dados fornecidos"""
+    """
+    Gera PPTX básico com dados fornecidos.
+    Com ?inline=true o arquivo é gerado em memória e devolvido na própria
+    resposta, sem gravar em output/ nem exigir o GET em /download.
+    """
     if not PPTX_GENERATOR_OK:
         raise HTTPException(
             status_code=503,
@@ -225,9 +431,20 @@ async def generate_pptx_basic(
             "generated_by": "CÓRTEX BI v2.0"
         }
         
+        filename = f"cortex_bi_basic_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx"
+        
+        if inline:
+            buffer = BytesIO()
+            _build_basic_presentation(analysis_data, buffer)
+            return Response(
+                content=buffer.getvalue(),
+                media_type=PPTX_MIME,
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            )
+        
         # Gerar PPTX
-        output_path = f"output/cortex_bi_basic_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx"
-        pptx_generator.generate_presentation(analysis_data, output_path)
+        output_path = f"output/{filename}"
+        _build_basic_presentation(analysis_data, output_path)
         
         return {
             "status": "success",
@@ -244,40 +461,79 @@ async def generate_pptx_basic(
 # ENDPOINTS DE DOWNLOAD
 # ==========================================
 
+class DownloadFileResponse(FileResponse):
+    """FileResponse com blocos de 1 MB (menos iterações/syscalls por download)"""
+    chunk_size = 1 << 20
+
+
 @app.get("/download/{filename}")
-async def download_file(filename: str):
+async def download_file(request: Request, filename: str):
     """Download de arquivos gerados"""
     file_path = f"output/{filename}"
-    if not os.path.exists(file_path):
+    
+    # Um único stat: reaproveitado para Content-Length e ETag
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
-    return FileResponse(
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers = {"Cache-Control": "public, max-age=300", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return DownloadFileResponse(
         path=file_path,
         filename=filename,
-        media_type='application/octet-stream'
+        media_type=PPTX_MIME if filename.endswith(".pptx") else 'application/octet-stream',
+        stat_result=st,
+        headers=headers
     )
 
 # ==========================================
 # ENDPOINTS DE UPLOAD
 # ==========================================
 
+# Buffer de cópia dos uploads (memória limitada a um bloco por upload)
+UPLOAD_BUFFER_SIZE = 1 << 20  # 1 MB
+
+# Extensão -> tipo de upload aceito - EDITE AQUI para suportar novos formatos
+_UPLOAD_KINDS = {'.csv': 'csv', '.xlsx': 'excel', '.xls': 'excel'}
+_UPLOAD_ERRORS = {'csv': "Apenas arquivos CSV são aceitos", 'excel': "Apenas arquivos Excel são aceitos"}
+
+def _validate_upload(filename: Optional[str], kind: str) -> str:
+    """
+    Valida nome e extensão do upload em uma única consulta e retorna o
+    basename (sem diretórios, evitando path traversal) a ser gravado.
+    """
+    base = os.path.basename(filename or "")
+    if _UPLOAD_KINDS.get(os.path.splitext(base)[1]) != kind:
+        raise HTTPException(status_code=400, detail=_UPLOAD_ERRORS[kind])
+    return base
+
+def _save_upload(file: UploadFile, filename: str, directory: str = "data") -> str:
+    """
+    Copia o upload (já em arquivo temporário) para o diretório em blocos.
+    filename deve vir de _validate_upload. Retorna o caminho gravado.
+    """
+    file_path = os.path.join(directory, filename)
+    with open(file_path, "wb", buffering=UPLOAD_BUFFER_SIZE) as buffer:
+        shutil.copyfileobj(file.file, buffer, length=UPLOAD_BUFFER_SIZE)
+    return file_path
+
 @app.post("/upload/csv")
-async def upload_csv(file: UploadFile = File(...)):
+def upload_csv(file: UploadFile = File(...)):
     """Upload de arquivo CSV"""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Apenas arquivos CSV são aceitos")
+    filename = _validate_upload(file.filename, 'csv')
     
     try:
         # Salvar arquivo
-        file_path = f"data/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        file_path = _save_upload(file, filename)
         
         return {
             "status": "success",
             "message": "Arquivo CSV enviado com sucesso",
-            "filename": file.filename,
+            "filename": filename,
             "path": file_path
         }
         
@@ -286,22 +542,18 @@ async def upload_csv(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Erro no upload: {str(e)}")
 
 @app.post("/upload/excel")
-async def upload_excel(file: UploadFile = File(...)):
+def upload_excel(file: UploadFile = File(...)):
     """Upload de arquivo Excel"""
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Apenas arquivos Excel são aceitos")
+    filename = _validate_upload(file.filename, 'excel')
     
     try:
         # Salvar arquivo
-        file_path = f"data/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        file_path = _save_upload(file, filename)
         
         return {
             "status": "success",
             "message": "Arquivo Excel enviado com sucesso",
-            "filename": file.filename,
+            "filename": filename,
             "path": file_path
         }
         
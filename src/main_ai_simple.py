@@ -55,12 +55,15 @@ async def health_check():
 
 @app.get("/list-files")
 async def list_files():
-    files = []
-    data_dir = "data"
-    if os.path.exists(data_dir):
-        for file in os.listdir(data_dir):
-            if file.endswith(('.csv', '.xlsx', '.xls')):
-                files.append(file)
+    # os.scandir traz o tipo de cada entrada junto com o nome (sem stat por arquivo)
+    try:
+        with os.scandir("data") as entries:
+            files = [
+                entry.name for entry in entries
+                if entry.name.endswith(('.csv', '.xlsx', '.xls')) and entry.is_file()
+            ]
+    except FileNotFoundError:
+        files = []
     return {"files": files}
 
 @app.post("/analyze-basic")
@@ -13,33 +13,83 @@ Configuração no GitHub:
     5. Events: Just the push event
 """
 
-from flask import Flask, request, jsonify
+from fastapi import FastAPI, APIRouter, Request, BackgroundTasks
+from fastapi.responses import JSONResponse, HTMLResponse
+import uvicorn
+import asyncio
+import json
 import subprocess
 import hmac
 import hashlib
 import os
 import sys
+import atexit
+import queue
 from threading import Thread
+from functools import lru_cache
 from datetime import datetime
 
-app = Flask(__name__)
-
 # Configurações
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '5001'))  # EDITE AQUI
 WEBHOOK_SECRET = os.getenv('GITHUB_WEBHOOK_SECRET', 'change-me-in-production')
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOG_FILE = os.path.join(PROJECT_DIR, 'logs', 'webhook.log')
 
+# Escrita do log em lote: log() apenas enfileira; uma thread mantém o arquivo
+# aberto e grava todas as linhas pendentes com um único write + flush
+LOG_MAX_BATCH = 256
+_log_queue = queue.Queue()
+_LOG_STOP = None  # Sentinela de encerramento
+
+
+def _log_writer():
+    """Thread de escrita: drena a fila em lotes no arquivo de log"""
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    with open(LOG_FILE, 'a') as f:
+        while True:
+            line = _log_queue.get()
+            if line is _LOG_STOP:
+                return
+            batch = [line]
+            while len(batch) < LOG_MAX_BATCH:
+                try:
+                    line = _log_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is _LOG_STOP:
+                    f.write(''.join(batch))
+                    return
+                batch.append(line)
+            f.write(''.join(batch))
+            f.flush()
+
+
+_log_thread = Thread(target=_log_writer, daemon=True)
+_log_thread.start()
+
+
+@atexit.register
+def _flush_log():
+    """Grava as linhas pendentes antes de o processo terminar"""
+    _log_queue.put(_LOG_STOP)
+    _log_thread.join(timeout=5)
+
+
 def log(message):
     """Escreve log com timestamp"""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     log_message = f"[{timestamp}] {message}"
     print(log_message)
     
-    # Garantir que diretório de logs existe
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    
-    with open(LOG_FILE, 'a') as f:
-        f.write(log_message + '\n')
+    _log_queue.put(log_message + '\n')
+
+@lru_cache(maxsize=1)
+def _hmac_template(secret):
+    """
+    HMAC-SHA256 já inicializado com a chave (pads interno/externo processados).
+    Cada verificação usa .copy(); é refeito automaticamente se o secret mudar.
+    """
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256)
 
 def verify_signature(payload, signature):
     """Verifica assinatura do webhook do GitHub"""
@@ -53,13 +103,17 @@ def verify_signature(payload, signature):
             log(f"⚠️  Algoritmo inválido: {sha_name}")
             return False
         
-        mac = hmac.new(
-            WEBHOOK_SECRET.encode(),
-            msg=payload,
-            digestmod=hashlib.sha256
-        )
+        mac = _hmac_template(WEBHOOK_SECRET).copy()
+        mac.update(payload)
         
-        is_valid = hmac.compare_digest(mac.hexdigest(), signature_hash)
+        # Compara os bytes do digest (32) em vez da string hex (64)
+        try:
+            signature_bytes = bytes.fromhex(signature_hash)
+        except ValueError:
+            log("❌ Assinatura inválida!")
+            return False
+        
+        is_valid = hmac.compare_digest(mac.digest(), signature_bytes)
         
         if not is_valid:
             log("❌ Assinatura inválida!")
@@ -70,22 +124,40 @@ def verify_signature(payload, signature):
         log(f"❌ Erro ao verificar assinatura: {e}")
         return False
 
-def run_command(command, shell=False):
-    """Executa comando e retorna resultado"""
+async def run_command_async(command, shell=False):
+    """
+    Executa comando sem bloquear o event loop e retorna resultado:
+    (sucesso, stdout, stderr)
+    """
     try:
-        result = subprocess.run(
-            command if shell else command.split(),
-            capture_output=True,
-            text=True,
-            cwd=PROJECT_DIR,
-            shell=shell
-        )
-        return result.returncode == 0, result.stdout, result.stderr
+        if shell:
+            proc = await asyncio.create_subprocess_shell(
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=PROJECT_DIR
+            )
+        else:
+            proc = await asyncio.create_subprocess_exec(
+                *command.split(),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=PROJECT_DIR
+            )
+        stdout, stderr = await proc.communicate()
+        return proc.returncode == 0, stdout.decode(errors='replace'), stderr.decode(errors='replace')
     except Exception as e:
         return False, "", str(e)
 
-def update_and_restart():
-    """Atualiza código e reinicia servidor"""
+async def _skipped():
+    """Resultado neutro para etapas opcionais dentro de um gather"""
+    return True, "", ""
+
+async def update_and_restart():
+    """
+    Atualiza código e reinicia servidor.
+    Etapas independentes (ex.: branch atual e backups) rodam em paralelo.
+    """
     try:
         log("🔄 Iniciando processo de atualização...")
         
@@ -93,21 +165,19 @@ def update_and_restart():
         os.chdir(PROJECT_DIR)
         log(f"📁 Diretório: {PROJECT_DIR}")
         
-        # Verificar branch atual
-        success, branch, _ = run_command("git branch --show-current")
+        # Verificar branch atual e fazer backup das configurações em paralelo
+        log("💾 Fazendo backup das configurações...")
+        (success, branch, _), _, _ = await asyncio.gather(
+            run_command_async("git branch --show-current"),
+            run_command_async("cp .env .env.backup", shell=True) if os.path.exists('.env') else _skipped(),
+            run_command_async("cp -r config config.backup", shell=True) if os.path.exists('config') else _skipped()
+        )
         if success:
             log(f"🌿 Branch atual: {branch.strip()}")
         
-        # Fazer backup das configurações
-        log("💾 Fazendo backup das configurações...")
-        if os.path.exists('.env'):
-            run_command("cp .env .env.backup", shell=True)
-        if os.path.exists('config'):
-            run_command("cp -r config config.backup", shell=True)
-        
         # Puxar atualizações
         log("⬇️  Baixando atualizações do GitHub...")
-        success, stdout, stderr = run_command("git pull origin master")
+        success, stdout, stderr = await run_command_async("git pull origin master")
         
         if success:
             log(f"✅ Git pull concluído:\n{stdout}")
@@ -115,18 +185,17 @@ def update_and_restart():
             log(f"❌ Erro no git pull:\n{stderr}")
             return False
         
-        # Restaurar configurações
+        # Restaurar configurações e verificar se requirements.txt mudou (em paralelo)
         log("♻️  Restaurando configurações...")
-        if os.path.exists('.env.backup'):
-            run_command("cp .env.backup .env", shell=True)
-        
-        # Verificar se requirements.txt mudou
         log("📦 Verificando dependências...")
-        success, diff, _ = run_command("git diff HEAD@{1} HEAD -- requirements.txt")
+        _, (success, diff, _) = await asyncio.gather(
+            run_command_async("cp .env.backup .env", shell=True) if os.path.exists('.env.backup') else _skipped(),
+            run_command_async("git diff HEAD@{1} HEAD -- requirements.txt")
+        )
         
         if diff.strip():
             log("📦 requirements.txt modificado. Atualizando dependências...")
-            success, stdout, stderr = run_command(
+            success, stdout, stderr = await run_command_async(
                 f"{sys.executable} -m pip install -r requirements.txt --upgrade"
             )
             if success:
@@ -144,16 +213,15 @@ def update_and_restart():
         
         # Método 1: Script de parada
         if os.path.exists('scripts/stop_ai.sh'):
-            run_command("bash scripts/stop_ai.sh", shell=True)
+            await run_command_async("bash scripts/stop_ai.sh", shell=True)
         elif os.path.exists('scripts/stop_ai.bat'):
-            run_command("scripts\\stop_ai.bat", shell=True)
+            await run_command_async("scripts\\stop_ai.bat", shell=True)
         
         # Método 2: pkill
-        run_command("pkill -f main_ai.py", shell=True)
+        await run_command_async("pkill -f main_ai.py", shell=True)
         
-        # Aguardar processo parar
-        import time
-        time.sleep(2)
+        # Aguardar processo parar (sem bloquear o event loop)
+        await asyncio.sleep(2)
         
         # Iniciar servidor
         log("🚀 Iniciando servidor...")
@@ -174,29 +242,38 @@ def update_and_restart():
         log(traceback.format_exc())
         return False
 
-@app.route('/webhook/github', methods=['POST'])
-def github_webhook():
+# Rotas do webhook; o app abaixo é servido pelo uvicorn na porta WEBHOOK_PORT.
+# Fica separado do CÓRTEX BI porque update_and_restart reinicia o main_ai.py.
+webhook_router = APIRouter(prefix="/webhook")
+
+@webhook_router.post('/github')
+async def github_webhook(request: Request, background_tasks: BackgroundTasks):
     """Endpoint para receber webhooks do GitHub"""
     
-    # Verificar assinatura
+    # Verificar assinatura sobre o corpo bruto
     signature = request.headers.get('X-Hub-Signature-256')
+    body = await request.body()
     
     if WEBHOOK_SECRET != 'change-me-in-production':
-        if not verify_signature(request.data, signature):
+        if not verify_signature(body, signature):
             log("❌ Webhook rejeitado: assinatura inválida")
-            return jsonify({'error': 'Invalid signature'}), 401
+            return JSONResponse({'error': 'Invalid signature'}, status_code=401)
     else:
         log("⚠️  AVISO: Webhook secret não configurado! Configure GITHUB_WEBHOOK_SECRET no .env")
     
     # Processar evento
     event = request.headers.get('X-GitHub-Event')
-    payload = request.json
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        log("❌ Webhook rejeitado: JSON inválido")
+        return JSONResponse({'error': 'Invalid JSON'}, status_code=400)
     
     log(f"📥 Webhook recebido: {event}")
     
     if event == 'ping':
         log("🏓 Ping recebido do GitHub")
-        return jsonify({'message': 'Pong! Webhook configurado com sucesso ✅'}), 200
+        return {'message': 'Pong! Webhook configurado com sucesso ✅'}
     
     if event == 'push':
         ref = payload.get('ref', '')
@@ -213,48 +290,46 @@ def github_webhook():
             log(f"👤 Pusher: {pusher}")
             log(f"💬 Commit: {commit_id} - {commit_message}")
             
-            # Executar atualização em thread separada
+            # Executar atualização em background, após enviar a resposta
             log("🚀 Iniciando atualização em background...")
-            thread = Thread(target=update_and_restart)
-            thread.daemon = True
-            thread.start()
+            background_tasks.add_task(update_and_restart)
             
-            return jsonify({
+            return {
                 'status': 'success',
                 'message': 'Atualização iniciada',
                 'commit': commit_id,
                 'pusher': pusher
-            }), 200
+            }
         else:
             log(f"ℹ️  Push ignorado (branch: {branch})")
-            return jsonify({
+            return {
                 'status': 'ignored',
                 'message': f'Push na branch {branch} foi ignorado. Apenas master dispara deploy.'
-            }), 200
+            }
     
     log(f"ℹ️  Evento {event} ignorado")
-    return jsonify({'status': 'ignored', 'message': f'Event {event} not handled'}), 200
+    return {'status': 'ignored', 'message': f'Event {event} not handled'}
 
-@app.route('/webhook/status', methods=['GET'])
-def webhook_status():
+@webhook_router.get('/status')
+async def webhook_status():
     """Verificar status do webhook e sistema"""
     try:
-        # Informações do Git
-        success, branch, _ = run_command("git branch --show-current")
-        current_branch = branch.strip() if success else "unknown"
-        
-        success, commit, _ = run_command("git rev-parse --short HEAD")
-        current_commit = commit.strip() if success else "unknown"
-        
-        success, remote, _ = run_command("git config --get remote.origin.url")
-        remote_url = remote.strip() if success else "unknown"
+        # Informações do Git (comandos independentes em paralelo, junto com o fetch)
+        (ok_branch, branch, _), (ok_commit, commit, _), (ok_remote, remote, _), _ = await asyncio.gather(
+            run_command_async("git branch --show-current"),
+            run_command_async("git rev-parse --short HEAD"),
+            run_command_async("git config --get remote.origin.url"),
+            run_command_async("git fetch origin master")
+        )
+        current_branch = branch.strip() if ok_branch else "unknown"
+        current_commit = commit.strip() if ok_commit else "unknown"
+        remote_url = remote.strip() if ok_remote else "unknown"
         
         # Verificar se há atualizações disponíveis
-        run_command("git fetch origin master")
-        success, behind, _ = run_command("git rev-list HEAD..origin/master --count")
+        success, behind, _ = await run_command_async("git rev-list HEAD..origin/master --count")
         commits_behind = int(behind.strip()) if success and behind.strip().isdigit() else 0
         
-        return jsonify({
+        return {
             'status': 'active',
             'webhook_secret_configured': WEBHOOK_SECRET != 'change-me-in-production',
             'project_dir': PROJECT_DIR,
@@ -266,58 +341,62 @@ def webhook_status():
                 'update_available': commits_behind > 0
             },
             'log_file': LOG_FILE
-        }), 200
+        }
         
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'status': 'error',
             'error': str(e)
-        }), 500
+        }, status_code=500)
+
+def _read_log_tail(lines):
+    """Lê as últimas linhas do log: (total de linhas, últimas linhas)"""
+    with open(LOG_FILE, 'r') as f:
+        all_lines = f.readlines()
+    return len(all_lines), all_lines[-lines:]
 
-@app.route('/webhook/logs', methods=['GET'])
-def webhook_logs():
+@webhook_router.get('/logs')
+async def webhook_logs(lines: int = 50):
     """Ver últimas linhas do log"""
     try:
-        lines = int(request.args.get('lines', 50))
-        
         if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, 'r') as f:
-                all_lines = f.readlines()
-                last_lines = all_lines[-lines:]
-                
-            return jsonify({
+            # Leitura do arquivo fora do event loop
+            total_lines, last_lines = await asyncio.to_thread(_read_log_tail, lines)
+            
+            return {
                 'log_file': LOG_FILE,
-                'total_lines': len(all_lines),
+                'total_lines': total_lines,
                 'showing_lines': len(last_lines),
                 'logs': ''.join(last_lines)
-            }), 200
+            }
         else:
-            return jsonify({
+            return JSONResponse({
                 'error': 'Log file not found',
                 'log_file': LOG_FILE
-            }), 404
+            }, status_code=404)
             
     except Exception as e:
-        return jsonify({
+        return JSONResponse({
             'error': str(e)
-        }), 500
+        }, status_code=500)
 
-@app.route('/webhook/update', methods=['POST'])
-def manual_update():
+@webhook_router.post('/update')
+async def manual_update(background_tasks: BackgroundTasks):
     """Disparar atualização manual (sem webhook)"""
     log("🔧 Atualização manual solicitada")
     
-    thread = Thread(target=update_and_restart)
-    thread.daemon = True
-    thread.start()
+    background_tasks.add_task(update_and_restart)
     
-    return jsonify({
+    return {
         'status': 'success',
         'message': 'Atualização manual iniciada'
-    }), 200
+    }
+
+app = FastAPI(title="CÓRTEX BI - Webhook Handler", docs_url=None, redoc_url=None)
+app.include_router(webhook_router)
 
-@app.route('/')
-def index():
+@app.get('/', response_class=HTMLResponse)
+async def index():
     """Página inicial do webhook handler"""
     return """
     <html>
@@ -382,5 +461,5 @@ if __name__ == '__main__':
     log("=" * 60)
     
     # Rodar em porta separada (não conflitar com CÓRTEX BI)
-    app.run(host='0.0.0.0', port=5001, debug=False)
+    uvicorn.run(app, host='0.0.0.0', port=WEBHOOK_PORT, access_log=False)
 
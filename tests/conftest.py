@@ -0,0 +1,12 @@
+"""
+Configuração do pytest: os módulos da aplicação são importados a partir de src/
+e os testes rodam num diretório temporário, pois alguns módulos criam data/ e
+logs/ no diretório atual ao serem importados.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.chdir(tempfile.mkdtemp(prefix="cortex_tests_"))
@@ -0,0 +1,55 @@
+"""
+Testes do DataLoader.load_csv: o leitor Arrow (chamada padrão) deve produzir
+o mesmo DataFrame que o pd.read_csv com os parâmetros padrão.
+"""
+
+import pandas as pd
+import pytest
+
+from agents import data_loader
+from agents.data_loader import DataLoader
+
+
+def _expected(loader: DataLoader, path) -> pd.DataFrame:
+    """Resultado do parser C do pandas com os parâmetros padrão de load_csv"""
+    df = pd.read_csv(path, encoding='utf-8', sep=',', decimal='.', thousands=',')
+    return loader._standardize_dataframe(df)
+
+
+@pytest.fixture
+def loader():
+    return DataLoader()
+
+
+def test_linhas_com_menos_colunas(loader, tmp_path):
+    path = tmp_path / "irregular.csv"
+    path.write_text("a,b,c\n1,2,3\n4,5\n6,7,8\n", encoding="utf-8")
+    
+    df = loader.load_csv(str(path))
+    
+    pd.testing.assert_frame_equal(df, _expected(loader, path))
+    assert df['c'].isna().tolist() == [False, True, False]
+
+
+def test_quebra_de_linha_entre_aspas_em_varios_blocos(loader, tmp_path, monkeypatch):
+    # Blocos pequenos para o valor multi-linha cruzar a fronteira entre blocos
+    monkeypatch.setattr(data_loader, 'CSV_BLOCK_SIZE', 64)
+    lines = ["id,texto"] + [f'{i},"linha {i}\ncontinua"' for i in range(200)]
+    path = tmp_path / "multilinha.csv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    
+    df = loader.load_csv(str(path))
+    
+    pd.testing.assert_frame_equal(df, _expected(loader, path))
+    assert len(df) == 200
+    assert df['texto'].iloc[0] == "linha 0\ncontinua"
+
+
+def test_cabecalhos_duplicados(loader, tmp_path):
+    path = tmp_path / "duplicados.csv"
+    path.write_text("a,a,b\n1,2,x\n3,4,y\n", encoding="utf-8")
+    
+    df = loader.load_csv(str(path))
+    
+    pd.testing.assert_frame_equal(df, _expected(loader, path))
+    assert list(df.columns) == ['a', 'a.1', 'b']
@@ -0,0 +1,70 @@
+"""
+Testes do cache de predições do MLEngine (predict_and_detect, usado pelo /analyze)
+"""
+
+import numpy as np
+import pytest
+
+from agents import ml_engine as ml_module
+from agents.ml_engine import MLEngine
+
+pytestmark = pytest.mark.skipif(
+    not (ml_module.SKLEARN_AVAILABLE and ml_module.CACHETOOLS_AVAILABLE),
+    reason="sklearn/cachetools não disponíveis"
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """MLEngine com classificador de qualidade e detector de anomalias mínimos"""
+    engine = MLEngine(models_dir=str(tmp_path))
+    rng = np.random.default_rng(0)
+    
+    engine.encoders["quality_classifier"] = ml_module.LabelEncoder()
+    y_quality = engine.encoders["quality_classifier"].fit_transform(["boa", "ruim"] * 20)
+    engine.models["quality_classifier"] = ml_module.RandomForestClassifier(n_estimators=5, random_state=0).fit(
+        rng.random((40, 6)), y_quality
+    )
+    engine.models["anomaly_detector"] = ml_module.IsolationForest(n_estimators=5, random_state=0).fit(
+        rng.random((40, 5))
+    )
+    return engine
+
+
+def _analyze_interaction(execution_time: float) -> dict:
+    """interaction_data como montado pelo /analyze do main_ai"""
+    return {
+        "request_data": {"analysis_type": "descriptive", "parameters": {}},
+        "response_data": {"summary": {"rows": 10}},
+        "execution_time": execution_time,
+        "success": True,
+        "user_id": "usuario_teste"
+    }
+
+
+def test_payload_repetido_reaproveita_predicao(engine, monkeypatch):
+    calls = {"quality": 0, "anomaly": 0}
+    predict_quality = engine._predict_quality_features
+    detect_anomaly = engine._detect_anomaly_features
+    
+    def count_quality(features):
+        calls["quality"] += 1
+        return predict_quality(features)
+    
+    def count_anomaly(features):
+        calls["anomaly"] += 1
+        return detect_anomaly(features)
+    
+    monkeypatch.setattr(engine, "_predict_quality_features", count_quality)
+    monkeypatch.setattr(engine, "_detect_anomaly_features", count_anomaly)
+    
+    # Mesmo payload, tempos medidos diferentes (perf_counter) dentro da mesma faixa
+    first = engine.predict_and_detect(_analyze_interaction(0.123456))
+    second = engine.predict_and_detect(_analyze_interaction(0.124789))
+    
+    assert calls == {"quality": 1, "anomaly": 1}
+    assert second == first
+    
+    # Tempo em outra faixa: nova predição
+    engine.predict_and_detect(_analyze_interaction(0.5))
+    assert calls == {"quality": 2, "anomaly": 2}